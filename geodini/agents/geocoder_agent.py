@@ -1,41 +1,38 @@
 import asyncio
-import json
 import logging
+import os
 import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pprint import pformat
 from typing import Any, Literal
 
-import pluggy
 from pydantic_ai import Agent
 from pyproj import Transformer
 from shapely.geometry import mapping, shape
 from shapely.ops import transform
 
-from geodini import hookspecs, lib
+from geodini.agents.utils.geocoder import geocode as overture_divisions_geocode
+from geodini.agents.utils.geocoder import (
+    pick_confident_match,
+    subtype_weights_version,
+)
 from geodini.agents.utils.postgis_exec import (
-    clear_geometries_table,
-    create_geometries_table,
-    insert_place,
     postgis_agent,
     postgis_query_judgement_agent,
     run_postgis_query,
     search_subtype_within_aoi,
 )
+from geodini.agents.utils.query_router import classify_query, routing_stats
 from geodini.cache import cached
+from geodini.registry import GEOCODER_BUDGET, fetch_geometries, run_geocoders
 
 
 logger = logging.getLogger(__name__)
 
-
-def get_plugin_manager():
-    pm = pluggy.PluginManager("geodini")
-    pm.add_hookspecs(hookspecs)
-    pm.load_setuptools_entrypoints("geodini")
-    pm.register(lib)
-    return pm
+# Set on results built while some geocoders timed out or failed, so they are
+# not cached. search() strips it before returning.
+PARTIAL_RESULT_KEY = "_partial"
 
 
 @dataclass
@@ -194,38 +191,61 @@ rerank_agent = Agent(
 )
 
 
-@cached(prefix="simple_geocode", ttl=3600)
-async def simple_geocode(query: str, simplify_geometry: bool = True) -> dict:
-    """Handle simple geocoding queries."""
+async def rephrase_query(query: str) -> RephrasedQuery:
+    """Rephrase a search query into a formal place name for geocoding."""
+    rephrased_query = await rephrase_agent.run(user_prompt=f"Search query: {query}")
+    logger.info(f"Rephrased query: {pformat(rephrased_query.output)}")
+    return rephrased_query.output
+
+
+@cached(
+    prefix="simple_geocode",
+    ttl=86400,  # 1 day
+    soft_ttl=3600,  # refresh in the background after 1 hour
+    ignore_kwargs=("rephrased_query",),
+    key_version=subtype_weights_version,
+    # Misses and partial results are served but not cached
+    cache_condition=lambda result: result["results"][0]["geometry"] is not None
+    and not result.get(PARTIAL_RESULT_KEY),
+)
+async def simple_geocode(
+    query: str,
+    simplify_geometry: bool = True,
+    rephrased_query: RephrasedQuery | None = None,
+) -> dict:
+    """
+    Handle simple geocoding queries.
+
+    `rephrased_query` can be passed when the query was already rephrased,
+    e.g. speculatively while routing, to skip the rephrase LLM call.
+    """
     logger.info(f"Starting simple geocode for {query}")
-    pm = get_plugin_manager()
-    geocoders = pm.hook.get_geocoders(geocoders=list())
-    logger.info(f"Geocoders: {geocoders}")
     start_time = time.time()
 
-    rephrased_query = await rephrase_agent.run(user_prompt=f"Search query: {query}")
-    logger.info(f"Rephrased query: {pformat(rephrased_query.output)}")
+    if rephrased_query is None:
+        rephrased_query = await rephrase_query(query)
 
-    results = []
-    for geocoder_group in geocoders:
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for geocoder in geocoder_group:
-                # Check if geocoder supports simplify_geometry parameter (like our postgis geocoder)
-                try:
-                    import inspect
-                    sig = inspect.signature(geocoder)
-                    if 'simplify_geometry' in sig.parameters:
-                        futures.append(executor.submit(geocoder, rephrased_query.output.query, simplify_geometry))
-                    else:
-                        futures.append(executor.submit(geocoder, rephrased_query.output.query))
-                except:
-                    # Fallback to original call if inspection fails
-                    futures.append(executor.submit(geocoder, rephrased_query.output.query))
-            
-            for future in futures:
-                results.extend(future.result())
+    geocode_start = time.monotonic()
+    geocoder_results = await run_geocoders(
+        rephrased_query.query,
+        simplify_geometry,
+        country_code=rephrased_query.country_code,
+    )
+    if rephrased_query.country_code and not geocoder_results.results:
+        # The country is a hint from the LLM; search everywhere if it was wrong.
+        # The retry gets what is left of the request budget, if it is limited
+        budget = None
+        if GEOCODER_BUDGET > 0:
+            budget = GEOCODER_BUDGET - (time.monotonic() - geocode_start)
+        if budget is None or budget > 0:
+            geocoder_results = await run_geocoders(
+                rephrased_query.query, simplify_geometry, budget=budget
+            )
+    results = geocoder_results.results
 
+    # Geocoder results may be shared with the in-process cache, so annotate
+    # copies rather than mutating them
+    results = [dict(result) for result in results]
     for result in results:
         if result["hierarchies"] is not None:
             result["hierarchy"] = result["hierarchies"][0]
@@ -255,43 +275,20 @@ async def simple_geocode(query: str, simplify_geometry: bool = True) -> dict:
             "country": result["country"],
             "subtype": result["subtype"],
             "source_type": result["source_type"],
-            "geometry": result["geometry"],
+            "geometry": result.get("geometry"),
             "hierarchy": result["hierarchy"],
         }
         for result in results
     }
 
     if places:
-        # Check if top result has perfect score and others don't - skip LLM if so
-        results_with_scores = [r for r in results if "similarity" in r]
-        if results_with_scores:
-            # Sort by similarity score (highest first)
-            results_with_scores.sort(key=lambda x: x.get("similarity", 0), reverse=True)
-            top_score = results_with_scores[0].get("similarity", 0)
-
-            # If top result has perfect score (1.0) and others don't, use it directly
-            if top_score == 1.0 and (
-                len(results_with_scores) == 1
-                or results_with_scores[1].get("similarity", 0) < 1.0
-            ):
-                logger.info(
-                    f"Perfect match found with score 1.0, skipping LLM reranking"
-                )
-                most_probable = results_dict.get(results_with_scores[0]["id"])
-            else:
-                # Use reranking agent to select the most relevant result
-                user_prompt = f"""
-                Rerank the following results based on the search query:
-                search query: {query},
-                results: {places}
-                """
-                rerank_result = await rerank_agent.run(
-                    user_prompt=user_prompt,
-                )
-                logger.info(f"Reranking result: {pformat(rerank_result.output)}")
-                most_probable = results_dict.get(rerank_result.output.most_probable)
+        # Skip the LLM when the top result is an exact match well ahead of others
+        confident_match = pick_confident_match(results)
+        if confident_match is not None:
+            logger.info("Confident exact match found, skipping LLM reranking")
+            most_probable = results_dict.get(confident_match["id"])
         else:
-            # No scores available, use reranking
+            # Use reranking agent to select the most relevant result
             user_prompt = f"""
             Rerank the following results based on the search query:
             search query: {query},
@@ -305,10 +302,17 @@ async def simple_geocode(query: str, simplify_geometry: bool = True) -> dict:
     else:
         most_probable = None
 
+    # Candidates are ranked without geometry; fetch it only for the winner
+    if most_probable and most_probable["geometry"] is None:
+        geometries = await fetch_geometries(
+            geocoder_results, [most_probable["id"]], simplify_geometry
+        )
+        most_probable["geometry"] = geometries.get(most_probable["id"])
+
     total_time = time.time() - start_time
     logger.info(f"Simple geocode total time: {total_time} seconds")
 
-    return {
+    result = {
         "query": query,
         "results": [
             {
@@ -318,6 +322,9 @@ async def simple_geocode(query: str, simplify_geometry: bool = True) -> dict:
             }
         ],
     }
+    if geocoder_results.timed_out or geocoder_results.failed:
+        result[PARTIAL_RESULT_KEY] = True
+    return result
 
 
 async def complex_geocode(query: str) -> dict:
@@ -333,26 +340,45 @@ async def complex_geocode(query: str) -> dict:
     geocoding_queries = complex_geocode_result.output.queries
     input_geometries = {}
 
-    for geocoding_query in geocoding_queries:
-        # For set queries, get unsimplified geometry from the database
-        # For non-set queries, allow simplification for performance
-        result = await simple_geocode(geocoding_query, simplify_geometry=not complex_geocode_result.output.set_query)
+    # The SQL only needs the place names, so generate it while the places are
+    # geocoded. Sub-places are geocoded concurrently, up to a configured limit.
+    postgis_query_task = asyncio.create_task(
+        postgis_agent.run(
+            user_prompt=f"Search query: {complex_geocode_result.output.rephrased_complex_query or query}. Geometries available in the geometries table: {geocoding_queries}"
+        )
+    )
+    semaphore = asyncio.Semaphore(int(os.getenv("COMPLEX_GEOCODE_CONCURRENCY", "4")))
+
+    async def geocode_input(geocoding_query: str) -> dict:
+        async with semaphore:
+            # For set queries, get unsimplified geometry from the database
+            # For non-set queries, allow simplification for performance
+            return await simple_geocode(
+                geocoding_query,
+                simplify_geometry=not complex_geocode_result.output.set_query,
+            )
+
+    geocode_tasks = [
+        asyncio.create_task(geocode_input(geocoding_query))
+        for geocoding_query in geocoding_queries
+    ]
+    try:
+        geocode_results = await asyncio.gather(*geocode_tasks)
+        postgis_query_result = await postgis_query_task
+    except BaseException:
+        for task in [postgis_query_task, *geocode_tasks]:
+            task.cancel()
+        raise
+
+    for geocoding_query, result in zip(geocoding_queries, geocode_results):
         if result["results"] and result["results"][0]["geometry"]:
             input_geometries[geocoding_query] = result["results"][0]["geometry"]
 
-    postgis_query_result = await postgis_agent.run(
-        user_prompt=f"Search query: {complex_geocode_result.output.rephrased_complex_query or query}. Geometries available in the geometries table: {input_geometries.keys()}"
-    )
     sql_query = postgis_query_result.output.query
     logger.info(f"PostGIS query result: {sql_query}")
 
-    for name, geometry in input_geometries.items():
-        geometry_json = json.dumps(geometry)
-        create_geometries_table()
-        insert_place(name, geometry_json)
-
     try:
-        result_geometry = run_postgis_query(sql_query)
+        result_geometry = await run_postgis_query(sql_query, input_geometries)
     except Exception:
         error_traceback = traceback.format_exc()
         logger.info(f"Error traceback:\n {error_traceback}")
@@ -371,13 +397,13 @@ async def complex_geocode(query: str) -> dict:
         )
         logger.info(f"user prompt:\n {user_prompt}")
         logger.info(f"Error re-checked query: {rechecked_query.output.query}")
-        result_geometry = run_postgis_query(rechecked_query.output.query)
-
-    clear_geometries_table()
+        result_geometry = await run_postgis_query(
+            rechecked_query.output.query, input_geometries
+        )
 
     if complex_geocode_result.output.set_query:
         # If this is a set query, we need to search for the set of results within an aoi
-        results = search_subtype_within_aoi(
+        results = await search_subtype_within_aoi(
             subtype=complex_geocode_result.output.subtype, aoi=result_geometry
         )
         # Note: search_subtype_within_aoi already returns results with name field
@@ -390,35 +416,118 @@ async def complex_geocode(query: str) -> dict:
             }
         ]
 
-    return {
+    result = {
         "query": query,
         "results": results,
     }
+    if any(
+        geocode_result.get(PARTIAL_RESULT_KEY) for geocode_result in geocode_results
+    ):
+        result[PARTIAL_RESULT_KEY] = True
+    return result
 
 
 @cached(
     prefix="unified_search",
-    ttl=1800,  # 30 minutes
+    ttl=86400,  # 1 day
+    soft_ttl=1800,  # refresh in the background after 30 minutes
+    key_version=subtype_weights_version,
     cache_condition=lambda result: result
-    and result.get("result")
-    and result["result"].get("geometry") is not None,
+    and result.get("results")
+    and result["results"][0].get("geometry") is not None
+    and not result.get(PARTIAL_RESULT_KEY),
 )
+async def cached_search(query: str) -> dict[str, Any]:
+    """Route a query to simple or complex geocoding, keeping internal keys"""
+    logger.info(f"Starting unified search for: {query}")
+
+    # Obvious queries are routed by local rules; only ambiguous ones need the LLM
+    query_type = None
+    if os.getenv("DISABLE_RULE_ROUTING", "false").lower() != "true":
+        query_type = classify_query(query)
+
+    if query_type is not None:
+        routing_stats[f"rules_{query_type}"] += 1
+    elif os.getenv("DISABLE_SPECULATIVE_ROUTING", "false").lower() != "true":
+        return await speculative_search(query)
+    else:
+        routing_result = await routing_agent.run(user_prompt=f"Search query: {query}")
+        query_type = routing_result.output.query_type
+        routing_stats[f"llm_{query_type}"] += 1
+
+    if query_type == "simple":
+        logger.info(f"Routing to simple geocode: {query}")
+        return await simple_geocode(query)
+    else:
+        logger.info(f"Routing to complex geocode: {query}")
+        return await complex_geocode(query)
+
+
 async def search(query: str) -> dict[str, Any]:
     """
     Unified search function that handles both simple and complex queries.
     Returns a single result with geometry and country information.
     """
-    logger.info(f"Starting unified search for: {query}")
+    result = await cached_search(query)
+    return {key: value for key, value in result.items() if key != PARTIAL_RESULT_KEY}
 
-    routing_result = await routing_agent.run(user_prompt=f"Search query: {query}")
 
-    if routing_result.output.query_type == "simple":
-        logger.info(f"Routing to simple geocode: {query}")
-        return await simple_geocode(query)
-    else:
+async def speculative_search(query: str) -> dict[str, Any]:
+    """
+    Route a query with the LLM while speculatively preparing the simple path.
+
+    Routing and rephrasing run concurrently, so a simple query pays a single
+    LLM latency before geocoding. With SPECULATIVE_LOOKUP=true the unrephrased
+    query is also looked up in the overture divisions geocoder, warming its
+    cache for when rephrasing leaves the query unchanged and finds no country.
+    Whatever the routing result makes unnecessary is cancelled or no longer
+    waited for; a lookup already running in its thread still completes.
+    """
+    routing_task = asyncio.create_task(
+        routing_agent.run(user_prompt=f"Search query: {query}")
+    )
+    rephrase_task = asyncio.create_task(rephrase_query(query))
+    lookup_task = None
+    if os.getenv("SPECULATIVE_LOOKUP", "false").lower() == "true":
+        lookup_task = asyncio.create_task(
+            asyncio.to_thread(overture_divisions_geocode, query)
+        )
+    speculative_tasks = [task for task in (rephrase_task, lookup_task) if task]
+
+    try:
+        routing_result = await routing_task
+    except BaseException:
+        for task in speculative_tasks:
+            task.cancel()
+        raise
+
+    query_type = routing_result.output.query_type
+    routing_stats[f"llm_{query_type}"] += 1
+
+    if query_type != "simple":
+        for task in speculative_tasks:
+            task.cancel()
         logger.info(f"Routing to complex geocode: {query}")
         return await complex_geocode(query)
 
+    logger.info(f"Routing to simple geocode: {query}")
+    try:
+        rephrased_query = await rephrase_task
+    except BaseException:
+        if lookup_task:
+            lookup_task.cancel()
+        raise
+
+    if lookup_task:
+        # Only the same call hits the warmed cache entry: cache keys compare
+        # the query exactly and include the country filter
+        if rephrased_query.query == query and not rephrased_query.country_code:
+            await asyncio.gather(lookup_task, return_exceptions=True)
+        else:
+            lookup_task.cancel()
+
+    return await simple_geocode(query, rephrased_query=rephrased_query)
+
 
 async def main():
     test_queries = [
@@ -1,11 +1,16 @@
+import functools
+import hashlib
 import json
 import logging
 import os
+import threading
 import time
+import unicodedata
 from pprint import pprint
 from typing import Any
 
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import ProgrammingError
 import dotenv
 
 from geodini.cache import cached
@@ -16,64 +21,298 @@ dotenv.load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+_engine = None
+_engine_lock = threading.Lock()
+
+# Simplification tolerances (degrees) with precomputed GeoJSON columns in
+# search_geometries. Keep in sync with SIMPLIFIED_GEOJSON_COLUMNS in ingest.py
+SIMPLIFIED_GEOJSON_COLUMNS = {
+    0.001: "geojson_simplified_001",
+    0.01: "geojson_simplified_01",
+    0.05: "geojson_simplified_05",
+}
+FULL_GEOJSON_COLUMN = "geojson"
+DEFAULT_SIMPLIFY_TOLERANCE = 0.001
+
+# Minimum trigram similarity of a candidate name, and candidates per query
+SIMILARITY_THRESHOLD = float(os.getenv("GEOCODE_SIMILARITY_THRESHOLD", "0.33"))
+CANDIDATE_LIMIT = int(os.getenv("GEOCODE_CANDIDATE_LIMIT", "50"))
+
+# Lead in weighted similarity an exact match needs over the runner-up for the
+# LLM reranker to be skipped. The default is larger than any gap between the
+# seeded weights, so only unambiguous names skip it until weights are tuned
+RERANK_SKIP_MARGIN = float(os.getenv("RERANK_SKIP_MARGIN", "1.5"))
+
+
+# Ranking boost per subtype, used when the subtype_weights table is missing.
+# Keep in sync with DEFAULT_SUBTYPE_WEIGHTS in ingest.py, which seeds the table
+DEFAULT_SUBTYPE_WEIGHTS = {
+    "country": 2.0,
+    "dependency": 2.0,
+    "macroregion": 2.0,
+    "region": 2.0,
+    "macrocounty": 2.0,
+    "county": 1.0,
+    "localadmin": 1.1,
+    "locality": 0.9,
+    "borough": 0.8,
+    "macrohood": 0.8,
+    "neighborhood": 0.8,
+    "microhood": 0.8,
+}
+
+# Weight of a candidate's subtype, looked up in the :weights JSON parameter;
+# subtypes without a weight count as 1.0
+SUBTYPE_WEIGHT_SQL = "COALESCE(CAST(CAST(:weights AS jsonb) ->> subtype AS float), 1.0)"
+
+# Seconds the subtype weights are used before being re-read from the table, so
+# that every worker process picks up changes
+SUBTYPE_WEIGHTS_TTL = float(os.getenv("SUBTYPE_WEIGHTS_TTL", "60"))
+
+_subtype_weights: dict[str, float] | None = None
+_subtype_weights_loaded_at = 0.0
+_subtype_weights_lock = threading.Lock()
+# Whether a background refresh is running; guarded by its own lock, since
+# _subtype_weights_lock is held while the table is read
+_subtype_weights_refreshing = False
+_subtype_weights_refreshing_lock = threading.Lock()
+
+
+def normalize_name(name: str) -> str:
+    """
+    Accent-fold, lowercase and collapse whitespace in a place name.
+
+    Keep in sync with normalize_name_array() in ingest.py, which builds the
+    name_keys column and the norm column of division_names.
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if unicodedata.category(char) != "Mn")
+    return " ".join(name.lower().split())
+
+
+def geojson_column(tolerance: float | None) -> str:
+    """
+    Get the precomputed GeoJSON column for a simplification tolerance.
+
+    Picks the coarsest precomputed level that is not coarser than the requested
+    tolerance, falling back to the full geometry.
+    """
+    if not tolerance:
+        return FULL_GEOJSON_COLUMN
+    levels = [level for level in SIMPLIFIED_GEOJSON_COLUMNS if level <= tolerance]
+    if not levels:
+        return FULL_GEOJSON_COLUMN
+    return SIMPLIFIED_GEOJSON_COLUMNS[max(levels)]
+
+
 # PostgreSQL connection settings
 def get_postgis_engine():
-    """Get PostgreSQL engine for PostGIS geocoding"""
-    host = os.getenv("POSTGRES_HOST") or "database"
-    database = os.getenv("POSTGRES_DB") or "postgres"
-    user = "postgres"
-    port = os.getenv("POSTGRES_PORT") or 5432
-    password = os.getenv("POSTGRES_PASSWORD")
+    """
+    Get the shared PostgreSQL engine for PostGIS geocoding.
+
+    The engine (and its connection pool) is created lazily on first use and
+    reused for the lifetime of the process. Pool behaviour can be tuned with
+    POSTGRES_POOL_SIZE, POSTGRES_MAX_OVERFLOW, POSTGRES_POOL_PRE_PING and
+    POSTGRES_POOL_RECYCLE (seconds).
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            host = os.getenv("POSTGRES_HOST") or "database"
+            database = os.getenv("POSTGRES_DB") or "postgres"
+            user = "postgres"
+            port = os.getenv("POSTGRES_PORT") or 5432
+            password = os.getenv("POSTGRES_PASSWORD")
+
+            _engine = create_engine(
+                f"postgresql://{user}:{password}@{host}:{port}/{database}",
+                pool_size=int(os.getenv("POSTGRES_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("POSTGRES_MAX_OVERFLOW", "10")),
+                pool_pre_ping=os.getenv("POSTGRES_POOL_PRE_PING", "true").lower()
+                in ("true", "1", "yes"),
+                pool_recycle=int(os.getenv("POSTGRES_POOL_RECYCLE", "1800")),
+            )
+            logger.info(f"Created PostGIS engine for {host}:{port}/{database}")
+
+    return _engine
+
+
+def load_subtype_weights() -> dict[str, float]:
+    """Read the subtype ranking weights from the subtype_weights table"""
+    engine = get_postgis_engine()
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text("SELECT subtype, weight FROM subtype_weights")
+        ).fetchall()
+    return {row.subtype: float(row.weight) for row in rows}
 
-    return create_engine(f"postgresql://{user}:{password}@{host}:{port}/{database}")
+
+def refresh_subtype_weights() -> dict[str, float]:
+    """
+    Re-read the subtype ranking weights if they are older than SUBTYPE_WEIGHTS_TTL.
+
+    Blocks on the database. Keeps the weights in use when the table cannot be
+    read, starting from DEFAULT_SUBTYPE_WEIGHTS.
+    """
+    global _subtype_weights, _subtype_weights_loaded_at
+    with _subtype_weights_lock:
+        if (
+            _subtype_weights is None
+            or time.monotonic() - _subtype_weights_loaded_at >= SUBTYPE_WEIGHTS_TTL
+        ):
+            try:
+                weights = load_subtype_weights()
+                if weights != _subtype_weights:
+                    logger.info(f"Loaded subtype weights: {weights}")
+                _subtype_weights = weights
+            except Exception as e:
+                logger.warning(f"Could not load subtype weights: {e}")
+                if _subtype_weights is None:
+                    _subtype_weights = dict(DEFAULT_SUBTYPE_WEIGHTS)
+            _subtype_weights_loaded_at = time.monotonic()
+    return _subtype_weights
+
+
+def _refresh_subtype_weights_in_background() -> None:
+    global _subtype_weights_refreshing
+    try:
+        refresh_subtype_weights()
+    finally:
+        _subtype_weights_refreshing = False
+
+
+def get_subtype_weights() -> dict[str, float]:
+    """
+    Get the subtype ranking weights in use without touching the database.
+
+    Safe to call on the event loop. Once the weights are older than
+    SUBTYPE_WEIGHTS_TTL they are re-read in a background thread, and the
+    current ones - DEFAULT_SUBTYPE_WEIGHTS until the first load - are returned
+    meanwhile.
+    """
+    global _subtype_weights_refreshing
+    if (
+        _subtype_weights is None
+        or time.monotonic() - _subtype_weights_loaded_at >= SUBTYPE_WEIGHTS_TTL
+    ):
+        with _subtype_weights_refreshing_lock:
+            start = not _subtype_weights_refreshing
+            _subtype_weights_refreshing = True
+        if start:
+            threading.Thread(
+                target=_refresh_subtype_weights_in_background,
+                name="subtype-weights-refresh",
+                daemon=True,
+            ).start()
+    weights = _subtype_weights
+    return DEFAULT_SUBTYPE_WEIGHTS if weights is None else weights
+
+
+def reload_subtype_weights() -> dict[str, float]:
+    """
+    Re-read the subtype ranking weights from the database now.
+
+    Raises if the table cannot be read, keeping the weights in use. Other
+    processes pick up the change within SUBTYPE_WEIGHTS_TTL.
+    """
+    global _subtype_weights, _subtype_weights_loaded_at
+    weights = load_subtype_weights()
+    with _subtype_weights_lock:
+        _subtype_weights = weights
+        _subtype_weights_loaded_at = time.monotonic()
+    logger.info(f"Reloaded subtype weights: {weights}")
+    return weights
+
+
+def subtype_weights_version() -> str:
+    """
+    Short hash of the subtype ranking weights in use.
+
+    Part of the cache keys of ranked results, so that results ranked with
+    other weights are not reused. Only reads the weights held in memory, as
+    cache keys are built on the event loop.
+    """
+    weights = json.dumps(get_subtype_weights(), sort_keys=True)
+    return hashlib.md5(weights.encode()).hexdigest()[:12]
 
 
 @cached(
     prefix="postgis_geocode",
-    ttl=3600,  # 1 hour
+    ttl=86400,  # 1 day
+    soft_ttl=3600,  # refresh in the background after 1 hour
+    key_version=subtype_weights_version,
     cache_condition=lambda result: result
     and len(result) > 0,  # Only cache non-empty results
 )
-def geocode(query: str, simplify_geometry: bool = True) -> list[dict[str, Any]]:
+def geocode(
+    query: str,
+    country_code: str | None = None,
+    subtypes: list[str] | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    threshold: float | None = None,
+    limit: int | None = None,
+    weights: dict[str, float] | None = None,
+) -> list[dict[str, Any]]:
     """
     Geocode using PostgreSQL/PostGIS database with trigram similarity search.
-    Follows the same signature and return format as the geocode() function.
+    Follows the same return format as the geocode() function, except that
+    candidates carry no geometry; use fetch_geometries() for the ones needed.
+
+    Places with a name - in any language or variant - equal to the normalized
+    query are looked up by index first; the trigram search over the
+    division_names table only runs when there is no exact match, so aliases
+    and names in other languages ("Bombay", "Deutschland") resolve directly.
+
+    Candidates can be restricted to a country (ISO 3166-1 alpha-2 code), to
+    subtypes and to a (min_x, min_y, max_x, max_y) bounding box in WGS84.
+    `threshold` and `limit` default to SIMILARITY_THRESHOLD and
+    CANDIDATE_LIMIT, and `weights` (subtype ranking weights) to the ones in
+    the subtype_weights table.
     """
-    start_time = time.time()
     engine = get_postgis_engine()
 
-    # Ensure pg_trgm extension is available
-    with engine.begin() as conn:
-        try:
-            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
-        except Exception as e:
-            logger.warning(f"Warning: Could not enable pg_trgm extension: {e}")
-
-    connect_time = time.time() - start_time
-    logger.info(f"PostgreSQL connection time: {connect_time:.2f} seconds")
-
     query_start_time = time.time()
 
-    # Build the PostgreSQL query using trigram similarity
-    sql_query = build_postgis_query(simplify_geometry)
+    name_key = normalize_name(query)
+    if not name_key:
+        return []
+
+    params = {
+        "name_key": name_key,
+        "threshold": SIMILARITY_THRESHOLD if threshold is None else threshold,
+        "limit": CANDIDATE_LIMIT if limit is None else limit,
+        "weights": json.dumps(get_subtype_weights() if weights is None else weights),
+    }
+    if country_code:
+        params["country"] = country_code.upper()
+    if subtypes:
+        params["subtypes"] = list(subtypes)
+    if bbox:
+        params.update(zip(("min_x", "min_y", "max_x", "max_y"), bbox))
+    filters = (bool(country_code), bool(subtypes), bool(bbox))
 
     try:
         with engine.begin() as conn:
-            result = conn.execute(text(sql_query), {"query": query})
-
-            rows = result.fetchall()
+            rows = conn.execute(exact_match_statement(*filters), params).fetchall()
+
+            if not rows:
+                # The % operator filters on pg_trgm.similarity_threshold, so
+                # match it to the threshold for this transaction
+                conn.execute(
+                    text(
+                        "SELECT set_config('pg_trgm.similarity_threshold', "
+                        ":threshold, true)"
+                    ),
+                    {"threshold": str(params["threshold"])},
+                )
+                rows = conn.execute(postgis_statement(*filters), params).fetchall()
 
             # Convert to the same format as the original geocode function
             results = []
             for row in rows:
-                # Parse geometry JSON if it exists
-                geometry = None
-                if row.geometry:
-                    try:
-                        geometry = json.loads(row.geometry)
-                    except (json.JSONDecodeError, TypeError):
-                        geometry = None
-
                 results.append(
                     {
                         "id": row.id,
@@ -86,10 +325,15 @@ def geocode(query: str, simplify_geometry: bool = True) -> list[dict[str, Any]]:
                         ),
                         "country": row.country,
                         "similarity": float(row.similarity),
-                        "geometry": geometry,
+                        "weighted_similarity": float(row.weighted_similarity),
                     }
                 )
 
+    except ProgrammingError as e:
+        # Missing tables or columns mean the database needs a new ingest, which
+        # must not look like a query without matches
+        logger.error(f"PostgreSQL schema error: {e}")
+        raise
     except Exception as e:
         logger.error(f"Error executing PostgreSQL query: {e}")
         return []
@@ -97,71 +341,182 @@ def geocode(query: str, simplify_geometry: bool = True) -> list[dict[str, Any]]:
     query_time = time.time() - query_start_time
     logger.info(f"PostgreSQL query execution time: {query_time:.2f} seconds")
 
-    total_time = time.time() - start_time
-    logger.info(f"Total query execution time: {total_time:.2f} seconds")
-
     return results
 
 
-def build_postgis_query(simplify_geometry: bool = True) -> str:
-    """Build PostgreSQL query for searching overture unified data using trigram similarity"""
+def pick_confident_match(
+    candidates: list[dict[str, Any]], margin: float | None = None
+) -> dict[str, Any] | None:
+    """
+    Get the candidate that is safe to return without LLM reranking, if any.
+
+    That is the best ranked candidate when it is an exact match (score 1.0)
+    and leads the runner-up's weighted similarity by at least `margin`
+    (RERANK_SKIP_MARGIN by default). Candidates without a weighted
+    similarity are ranked by their similarity.
+    """
+    if margin is None:
+        margin = RERANK_SKIP_MARGIN
+
+    def weighted(candidate):
+        return candidate.get("weighted_similarity", candidate["similarity"])
+
+    scored = [candidate for candidate in candidates if "similarity" in candidate]
+    if not scored:
+        return None
+    scored.sort(key=weighted, reverse=True)
+    if scored[0]["similarity"] < 1.0:
+        return None
+    if len(scored) > 1 and weighted(scored[0]) - weighted(scored[1]) < margin:
+        return None
+    return scored[0]
+
+
+def fetch_geometries(
+    ids: list[str], simplify_geometry: bool = True, tolerance: float | None = None
+) -> dict[str, dict[str, Any] | None]:
+    """
+    Fetch GeoJSON geometries for geocoded candidates in one query.
+
+    Geometries are simplified with DEFAULT_SIMPLIFY_TOLERANCE unless
+    `simplify_geometry` is False; `tolerance` selects another level.
+    Returns a mapping of id to geometry.
+    """
+    if not ids:
+        return {}
 
-    # Choose geometry function based on whether to simplify
-    geometry_func = "ST_AsGeoJSON(ST_Simplify(geometry, 0.001))" if simplify_geometry else "ST_AsGeoJSON(geometry)"
+    if tolerance is None and simplify_geometry:
+        tolerance = DEFAULT_SIMPLIFY_TOLERANCE
+    geometry_column = geojson_column(tolerance if simplify_geometry else None)
 
     sql_query = f"""
-        SELECT 
+        SELECT id, {geometry_column} as geometry
+        FROM search_geometries
+        WHERE id = ANY(:ids)
+    """
+
+    engine = get_postgis_engine()
+    try:
+        with engine.begin() as conn:
+            rows = conn.execute(text(sql_query), {"ids": list(ids)}).fetchall()
+    except ProgrammingError as e:
+        logger.error(f"PostgreSQL schema error: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching geometries: {e}")
+        return {}
+
+    geometries = {}
+    for row in rows:
+        try:
+            geometries[row.id] = json.loads(row.geometry) if row.geometry else None
+        except (json.JSONDecodeError, TypeError):
+            geometries[row.id] = None
+    return geometries
+
+
+# Lets the geocoder registry fetch geometries for candidates from this geocoder
+geocode.fetch_geometries = fetch_geometries
+
+
+def build_filters(country: bool, subtypes: bool, bbox: bool) -> str:
+    """Build the SQL conditions for the filters geocode() was given"""
+    conditions = []
+    if country:
+        conditions.append("g.country = :country")
+    if subtypes:
+        conditions.append("g.subtype = ANY(:subtypes)")
+    if bbox:
+        conditions.append(
+            "g.geometry && ST_MakeEnvelope(:min_x, :min_y, :max_x, :max_y, 4326)"
+        )
+    return "".join(f"\n            AND {condition}" for condition in conditions)
+
+
+def build_exact_match_query(
+    country: bool = False, subtypes: bool = False, bbox: bool = False
+) -> str:
+    """Build PostgreSQL query for places with a name equal to a normalized name"""
+
+    sql_query = f"""
+        SELECT
+            g.id,
+            COALESCE(g.common_en_name, g.primary_name) as name,
+            'exact' as name_type,
+            g.subtype,
+            g.source_type,
+            g.hierarchies,
+            g.country,
+            1.0 as similarity,
+            {SUBTYPE_WEIGHT_SQL} as weighted_similarity
+        FROM search_geometries g
+        WHERE g.name_keys @> ARRAY[CAST(:name_key AS text)]{build_filters(country, subtypes, bbox)}
+        ORDER BY weighted_similarity DESC
+        LIMIT :limit
+    """
+
+    return sql_query
+
+
+def build_postgis_query(
+    country: bool = False, subtypes: bool = False, bbox: bool = False
+) -> str:
+    """
+    Build PostgreSQL query for searching overture unified data using trigram
+    similarity over every name of a place, in any language or variant.
+
+    The similarity of each name is computed once, in a lateral subquery, and
+    the country, subtype and bounding box filters are applied before picking
+    the best name per place.
+    """
+
+    sql_query = f"""
+        SELECT
             id,
-            COALESCE(common_en_name, primary_name) as name,
-            CASE
-                WHEN COALESCE(SIMILARITY(primary_name, :query), 0) >= 
-                     COALESCE(SIMILARITY(common_en_name, :query), 0)
-                THEN 'primary'
-                ELSE 'common_en'
-            END as name_type,
+            name,
+            name_type,
             subtype,
             source_type,
             hierarchies,
             country,
-            GREATEST(
-                COALESCE(SIMILARITY(primary_name, :query), 0),
-                COALESCE(SIMILARITY(common_en_name, :query), 0)
-            ) as similarity,
-            {geometry_func} as geometry,
-            GREATEST(
-                COALESCE(SIMILARITY(primary_name, :query), 0),
-                COALESCE(SIMILARITY(common_en_name, :query), 0)
-            ) * CASE subtype
-                WHEN 'country' THEN 2.0
-                WHEN 'dependency' THEN 2.0
-                WHEN 'macroregion' THEN 2.0
-                WHEN 'region' THEN 2.0
-                WHEN 'macrocounty' THEN 2.0
-                WHEN 'county' THEN 1.0
-                WHEN 'localadmin' THEN 1.1
-                WHEN 'locality' THEN 0.9
-                WHEN 'borough' THEN 0.8
-                WHEN 'macrohood' THEN 0.8
-                WHEN 'neighborhood' THEN 0.8
-                WHEN 'microhood' THEN 0.8
-                ELSE 1.0
-            END as weighted_similarity
-        FROM all_geometries
-        WHERE 
-            source_type = 'division'
-            AND geometry IS NOT NULL
-            AND (primary_name % :query OR common_en_name % :query)
-            AND GREATEST(
-                COALESCE(SIMILARITY(primary_name, :query), 0),
-                COALESCE(SIMILARITY(common_en_name, :query), 0)
-            ) > 0.33
+            similarity,
+            similarity * {SUBTYPE_WEIGHT_SQL} as weighted_similarity
+        FROM (
+            SELECT DISTINCT ON (g.id)
+                g.id,
+                COALESCE(g.common_en_name, g.primary_name) as name,
+                n.kind as name_type,
+                g.subtype,
+                g.source_type,
+                g.hierarchies,
+                g.country,
+                s.similarity
+            FROM division_names n
+            CROSS JOIN LATERAL (SELECT SIMILARITY(n.norm, :name_key) as similarity) s
+            JOIN search_geometries g ON g.id = n.division_id
+            WHERE n.norm % :name_key
+            AND s.similarity > :threshold{build_filters(country, subtypes, bbox)}
+            ORDER BY g.id, s.similarity DESC
+        ) candidates
         ORDER BY weighted_similarity DESC
-        LIMIT 50
+        LIMIT :limit
     """
 
     return sql_query
 
 
+# One statement per combination of filters, built once and reused so that
+# SQLAlchemy's compiled statement cache is hit on every call
+@functools.lru_cache(maxsize=None)
+def exact_match_statement(country: bool, subtypes: bool, bbox: bool):
+    return text(build_exact_match_query(country, subtypes, bbox))
+
+
+@functools.lru_cache(maxsize=None)
+def postgis_statement(country: bool, subtypes: bool, bbox: bool):
+    return text(build_postgis_query(country, subtypes, bbox))
+
+
 if __name__ == "__main__":
     import time
 
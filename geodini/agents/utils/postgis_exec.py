@@ -1,118 +1,146 @@
+import asyncio
 import json
+import logging
 import os
 from dataclasses import dataclass
 
-import psycopg2
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
 from pydantic_ai import Agent
 
+from geodini.agents.utils.geocoder import DEFAULT_SIMPLIFY_TOLERANCE, geojson_column
+
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class PostGISResult:
     query: str
 
 
-def get_postgis_connection():
-    """Get a connection to the PostGIS database."""
-    return psycopg2.connect(
+_pool: AsyncConnectionPool | None = None
+_pool_lock = asyncio.Lock()
+
+
+def get_postgis_conninfo() -> str:
+    """Get the connection string for the PostGIS database."""
+    return make_conninfo(
         host=os.getenv("POSTGRES_HOST") or "database",
-        database=os.getenv("POSTGRES_DB") or "geodini",
+        dbname=os.getenv("POSTGRES_DB") or "geodini",
         user="postgres",
         port=os.getenv("POSTGRES_PORT") or 5432,
         password=os.getenv("POSTGRES_PASSWORD"),
     )
 
 
+async def open_postgis_pool() -> AsyncConnectionPool:
+    """
+    Open the shared async connection pool for the PostGIS database.
+
+    Called from the API lifespan; helpers also open it lazily on first use so
+    scripts and the MCP server work without an explicit startup step.
+    Pool size is configured with POSTGRES_ASYNC_POOL_MIN_SIZE and
+    POSTGRES_ASYNC_POOL_MAX_SIZE.
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            pool = AsyncConnectionPool(
+                get_postgis_conninfo(),
+                min_size=int(os.getenv("POSTGRES_ASYNC_POOL_MIN_SIZE", "1")),
+                max_size=int(os.getenv("POSTGRES_ASYNC_POOL_MAX_SIZE", "10")),
+                open=False,
+            )
+            await pool.open()
+            _pool = pool
+            logger.info("Opened PostGIS async connection pool")
+    return _pool
+
+
+async def close_postgis_pool():
+    """Close the shared async connection pool, if open."""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+            logger.info("Closed PostGIS async connection pool")
+
+
+async def get_postgis_pool() -> AsyncConnectionPool:
+    """Get the shared async connection pool, opening it if needed."""
+    if _pool is not None:
+        return _pool
+    return await open_postgis_pool()
+
+
+# Input geometries for a complex query live in a transaction-scoped temporary
+# table. It shadows any permanent `geometries` table, is only visible to the
+# connection running the query and is dropped when the transaction ends, so
+# concurrent requests never see each other's rows.
 geometry_table_schema = """
-CREATE TABLE IF NOT EXISTS geometries (
+CREATE TEMP TABLE geometries (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     geom GEOMETRY(Geometry, 4326),
     geometry GEOMETRY(Geometry, 4326)
-);
+) ON COMMIT DROP;
 """
 
 
-def create_geometries_table():
-    """Create a table for storing places with name and geometry columns."""
-    conn = get_postgis_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(geometry_table_schema)
-        conn.commit()
-    finally:
-        conn.close()
-
-
-def insert_place(name: str, geometry: str):
-    """Insert a place into the database."""
-    conn = get_postgis_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO geometries (name, geom, geometry) VALUES (%s, %s, %s)",
-                (name, geometry, geometry),
-            )
-        conn.commit()
-    finally:
-        conn.close()
-
-
-def run_postgis_query(query: str):
-    """Run a PostGIS query on the database."""
-    conn = get_postgis_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(query)
-            results = cur.fetchone()
-            return json.loads(results[0])
-    finally:
-        conn.close()
-
-
-def clear_geometries_table():
-    """Clear the geometries table."""
-    conn = get_postgis_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM geometries")
-        conn.commit()
-    finally:
-        conn.close()
-
-
-def delete_geometries_table():
-    """Delete the geometries table."""
-    conn = get_postgis_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("DROP TABLE IF EXISTS geometries")
-        conn.commit()
-    finally:
-        conn.close()
-
-
-def search_subtype_within_aoi(subtype: str, aoi: dict) -> list[dict]:
+async def run_postgis_query(query: str, geometries: dict[str, dict] | None = None):
+    """
+    Run a PostGIS query on the database.
+
+    `geometries` maps place names to GeoJSON geometries; they are made
+    available to the query as the `geometries` table for this call only.
+    """
+    pool = await get_postgis_pool()
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            await conn.execute(geometry_table_schema)
+            async with conn.cursor() as cur:
+                if geometries:
+                    await cur.executemany(
+                        """
+                        INSERT INTO geometries (name, geom, geometry)
+                        VALUES (
+                            %s,
+                            ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326),
+                            ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326)
+                        )
+                        """,
+                        [
+                            (name, json.dumps(geometry), json.dumps(geometry))
+                            for name, geometry in geometries.items()
+                        ],
+                    )
+                await cur.execute(query)
+                results = await cur.fetchone()
+    return json.loads(results[0])
+
+
+async def search_subtype_within_aoi(subtype: str, aoi: dict) -> list[dict]:
     """Search for a subtype within an area of interest (AOI)."""
     # aoi is the geojson geometry as dict as returned from run_postgis_query
     # return a list of dictionaries of the form:
     # { "geometry": result_geometry_as_json_dict, "country": country_name }
-    conn = get_postgis_connection()
-    try:
-        with conn.cursor() as cur:
+    pool = await get_postgis_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             # Convert AOI dict to GeoJSON string
             aoi_geojson = json.dumps(aoi)
             
             # SQL query to find places of given subtype within the AOI
-            sql_query = """
+            sql_query = f"""
             SELECT 
-                ST_AsGeoJSON(ST_Simplify(geometry, 0.001)) as geometry,
+                {geojson_column(DEFAULT_SIMPLIFY_TOLERANCE)} as geometry,
                 country,
                 COALESCE(common_en_name, primary_name) as name
-            FROM all_geometries
+            FROM search_geometries
             WHERE 
-                source_type = 'division'
-                AND subtype = %s
-                AND geometry IS NOT NULL
+                subtype = %s
                 AND ST_Within(
                     geometry,
                     ST_GeomFromGeoJSON(%s)
@@ -122,8 +150,8 @@ def search_subtype_within_aoi(subtype: str, aoi: dict) -> list[dict]:
             LIMIT 100
             """
             
-            cur.execute(sql_query, (subtype, aoi_geojson))
-            results = cur.fetchall()
+            await cur.execute(sql_query, (subtype, aoi_geojson))
+            results = await cur.fetchall()
             
             # Convert results to expected format
             formatted_results = []
@@ -136,8 +164,6 @@ def search_subtype_within_aoi(subtype: str, aoi: dict) -> list[dict]:
                 })
             
             return formatted_results
-    finally:
-        conn.close()
 
 
 postgis_agent = Agent(
@@ -206,7 +232,3 @@ postgis_query_judgement_agent = Agent(
     You need to return the SQL query only, no other text.
     """,
 )
-
-if __name__ == "__main__":
-    delete_geometries_table()
-    create_geometries_table()
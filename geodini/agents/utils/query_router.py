@@ -0,0 +1,92 @@
+"""
+Deterministic pre-routing of search queries.
+
+Queries that are obviously simple (a plain place name) or obviously complex
+(a distance from a place, a set of places in an area) are classified locally
+so search() can skip the routing LLM call. A spatial word on its own is not
+enough, since many place names contain one ("Near Islands", "Outside Lands",
+"Scottish Borders"). Anything else - including queries joined with "and", "&"
+or "+", which may be several places ("India and Sri Lanka") or one ("Castile
+and León") - is left to the routing agent.
+"""
+
+import re
+from collections import Counter
+from typing import Literal
+
+
+# How often each routing path was taken, e.g. "rules_simple" or "llm_complex"
+routing_stats: Counter = Counter()
+
+SPATIAL_OPERATOR_PATTERN = re.compile(
+    r"\b("
+    r"within|near|nearby|around|surrounding|along|between|beyond|outside|"
+    r"except|excluding|buffer|intersection|borders?|bordering|"
+    r"(?:north|south|east|west|northeast|northwest|southeast|southwest)(?:ern)?\s+of|"
+    r"(?:north|south|east|west)(?:ern)?\s+(?:half|part)"
+    r")\b",
+    re.IGNORECASE,
+)
+
+DISTANCE_PATTERN = re.compile(
+    r"\b\d+(?:\.\d+)?\s*(?:km|kms|kilomet(?:er|re)s?|mi|miles?|m|met(?:er|re)s?)\b",
+    re.IGNORECASE,
+)
+
+CONJUNCTION_PATTERN = re.compile(r"\b(?:and|or)\b|&|\+", re.IGNORECASE)
+
+# Sets of places within an area, e.g. "regions in India" or "all states of
+# Brazil". Anchored to the start so names like "United States of America" or
+# "Federated States of Micronesia" are not mistaken for sets.
+SET_WORDS = (
+    r"(?:regions|localities|localadmins|counties|cities|towns|villages|states|"
+    r"provinces|districts|municipalities|neighbou?rhoods|boroughs|countries)"
+)
+SET_QUERY_PATTERN = re.compile(
+    rf"^(?:all\s+(?:the\s+)?)?{SET_WORDS}\s+"
+    r"(?:in|within|inside|across|near|around|along|bordering)\b"
+    rf"|^all\s+(?:the\s+)?{SET_WORDS}\s+of\b",
+    re.IGNORECASE,
+)
+
+# Only letters, spaces and light punctuation, up to a handful of words
+PLAIN_NAME_PATTERN = re.compile(r"^[^\W\d_]+(?:[\s,.'’-]+[^\W\d_]+){0,5}\.?$")
+
+# Words that can make an otherwise plain name relational, e.g. "London in Canada"
+AMBIGUOUS_WORD_PATTERN = re.compile(r"\b(?:in|of|at|by|from|to)\b", re.IGNORECASE)
+
+
+def classify_query(query: str) -> Literal["simple", "complex"] | None:
+    """
+    Classify a search query without an LLM.
+
+    Returns "simple" or "complex" when the rules are confident, or None when
+    the query is ambiguous and should go to the routing agent.
+    """
+    normalized = " ".join(query.split())
+    if not normalized:
+        return None
+
+    if SET_QUERY_PATTERN.match(normalized):
+        return "complex"
+
+    # A spatial keyword or a distance on its own is weak evidence: "Near
+    # Islands", "Scottish Borders" and "100 Mile House" are all place names.
+    # Only the two together ("within 10 km of Paris") are clearly complex.
+    has_operator = SPATIAL_OPERATOR_PATTERN.search(normalized)
+    has_distance = DISTANCE_PATTERN.search(normalized)
+    if has_operator and has_distance:
+        return "complex"
+    if has_operator or has_distance:
+        return None
+
+    # Conjunctions join several places as often as they are part of one name
+    if CONJUNCTION_PATTERN.search(normalized):
+        return None
+
+    if PLAIN_NAME_PATTERN.match(normalized) and not AMBIGUOUS_WORD_PATTERN.search(
+        normalized
+    ):
+        return "simple"
+
+    return None
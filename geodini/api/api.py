@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import Any
 
 import dotenv
@@ -8,8 +10,19 @@ from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 
 from geodini.agents.geocoder_agent import search
-from geodini.agents.utils.postgis_exec import get_postgis_connection
-from geodini.cache import init_cache
+from geodini.agents.utils.geocoder import (
+    get_subtype_weights,
+    refresh_subtype_weights,
+    reload_subtype_weights,
+)
+from geodini.agents.utils.query_router import routing_stats
+from geodini.agents.utils.postgis_exec import (
+    close_postgis_pool,
+    get_postgis_pool,
+    open_postgis_pool,
+)
+from geodini.cache import cache_status, init_cache
+from geodini.registry import geocoder_stats, init_geocoders, shutdown_geocoders
 
 
 logger = logging.getLogger(__name__)
@@ -20,11 +33,28 @@ dotenv.load_dotenv()
 # Initialize cache based on environment settings
 init_cache()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    init_geocoders()
+    await open_postgis_pool()
+    # Load the ranking weights before serving, so early requests do not rank
+    # with the defaults while the first background refresh runs
+    await asyncio.to_thread(refresh_subtype_weights)
+    try:
+        yield
+    finally:
+        await close_postgis_pool()
+        shutdown_geocoders()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Geodini API",
     description="API for geospatial data search using Geodini",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -79,24 +109,56 @@ async def health_check():
     """Health check endpoint to verify the API is running."""
     try:
         # Test PostGIS connection
-        conn = get_postgis_connection()
-        if conn is None:
-            raise Exception("PostGIS connection failed")
-        # execute a simple query to check the connection
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1")
-            result = cur.fetchone()
-            if result[0] != 1:
-                raise Exception("PostGIS failed to execute test query")
+        pool = await get_postgis_pool()
+        async with pool.connection() as conn:
+            # execute a simple query to check the connection
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT 1")
+                result = await cur.fetchone()
+                if result[0] != 1:
+                    raise Exception("PostGIS failed to execute test query")
     except Exception as e:
         logger.exception(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
-    finally:
-        if "conn" in locals() and conn is not None:
-            conn.close()
     return {"status": "healthy"}
 
 
+@app.get("/cache/status")
+async def cache_status_endpoint() -> dict[str, Any]:
+    """Cache availability, in-process cache size and per-tier hit/miss counters."""
+    return cache_status()
+
+
+@app.get("/stats")
+async def stats_endpoint() -> dict[str, Any]:
+    """Counters for how search queries were handled."""
+    return {"routing": dict(routing_stats), "geocoders": dict(geocoder_stats)}
+
+
+@app.get("/subtype-weights")
+async def subtype_weights_endpoint() -> dict[str, float]:
+    """Subtype ranking weights currently used by the geocoder."""
+    return get_subtype_weights()
+
+
+@app.post("/subtype-weights/reload")
+async def reload_subtype_weights_endpoint() -> dict[str, float]:
+    """
+    Re-read the subtype ranking weights from the subtype_weights table.
+
+    Other worker processes pick up the change within SUBTYPE_WEIGHTS_TTL
+    seconds. Cached results are keyed by the weights they were ranked with,
+    so none ranked with the old weights are served afterwards.
+    """
+    try:
+        return await asyncio.to_thread(reload_subtype_weights)
+    except Exception as e:
+        logger.exception(f"Error reloading subtype weights: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error reloading subtype weights: {str(e)}"
+        )
+
+
 if __name__ == "__main__":
     # Get port from environment variable or use default
     port = int(os.environ.get("PORT", 9000))
@@ -1,22 +1,171 @@
 import os
 import json
+import time
 import hashlib
 import logging
 import asyncio
-from typing import Any, Optional, Callable
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple, Optional
 from functools import wraps
 
 import redis
+import redis.asyncio as aioredis
 from redis.exceptions import RedisError
 
+from geodini.serialization import CacheCodec, CacheCodecError, is_compressed
+
 logger = logging.getLogger(__name__)
 
+# Cross-process single-flight for cache misses, coordinated through a Redis lock
+DISTRIBUTED_LOCK = os.getenv("CACHE_DISTRIBUTED_LOCK", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+LOCK_TTL = int(os.getenv("CACHE_LOCK_TTL", "60"))
+LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", "30"))
+LOCK_POLL_INTERVAL = 0.1
+
+# Maximum number of stale entries refreshed in the background at once
+REFRESH_CONCURRENCY = int(os.getenv("CACHE_REFRESH_CONCURRENCY", "4"))
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+_MISSING = object()
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    # Unix time the value was computed; None for entries written without it
+    created_at: Optional[float]
+
+    def is_stale(self, soft_ttl: int) -> bool:
+        """Check if the entry is older than the soft TTL"""
+        return self.created_at is not None and time.time() - self.created_at > soft_ttl
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at, size_in_bytes, value)
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def is_enabled(self) -> bool:
+        """Check if the local cache can hold any entries"""
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Any:
+        """Get a live entry, or _MISSING if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float, size: int) -> bool:
+        """Store an entry, evicting least recently used ones to stay in bounds"""
+        if not self.is_enabled() or ttl <= 0 or size > self.max_bytes:
+            return False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Delete an entry"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self._bytes -= entry[1]
+            return True
+
+    def clear(self):
+        """Delete all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def status(self) -> dict:
+        """Get current size information"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
 
 class RedisCache:
-    """Redis-based caching for function results"""
+    """
+    Redis-based caching for function results.
+
+    An optional in-process LRU (L1) sits in front of Redis (L2) so the hottest
+    entries are served without a network round trip or deserialization. It is
+    sized with CACHE_LOCAL_MAX_ENTRIES and CACHE_LOCAL_MAX_BYTES; setting
+    either to 0 disables it. Values returned from L1 are shared objects and
+    must not be mutated by callers.
+
+    Values are stored in Redis through a CacheCodec, configured with
+    CACHE_SERIALIZER (msgpack or json), CACHE_COMPRESSION (zstd, lz4, zlib
+    or none) and CACHE_COMPRESSION_MIN_BYTES.
+    """
 
     def __init__(self):
         self.redis_client = None
+        self.async_redis_client = None
+        self.local = LocalCache(
+            max_entries=int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "256")),
+            max_bytes=int(os.getenv("CACHE_LOCAL_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+        self.codec = CacheCodec(
+            serializer=os.getenv("CACHE_SERIALIZER", "msgpack"),
+            compression=os.getenv("CACHE_COMPRESSION", "zstd"),
+            min_compress_bytes=int(os.getenv("CACHE_COMPRESSION_MIN_BYTES", "1024")),
+        )
+        self.stats = {
+            "l1_hits": 0,
+            "l1_misses": 0,
+            "l2_hits": 0,
+            "l2_misses": 0,
+            "coalesced": 0,
+            "lock_waits": 0,
+            "stale_hits": 0,
+            "refreshes": 0,
+            "bytes_serialized": 0,
+            "bytes_stored": 0,
+            # Serialized and stored sizes of the entries that were compressed
+            "bytes_before_compression": 0,
+            "bytes_after_compression": 0,
+        }
         self._connect()
 
     def _connect(self):
@@ -32,7 +181,7 @@ class RedisCache:
                 port=port,
                 password=password,
                 db=db,
-                decode_responses=True,
+                decode_responses=False,
                 socket_timeout=5,
                 socket_connect_timeout=5,
                 retry_on_timeout=True,
@@ -42,9 +191,26 @@ class RedisCache:
             self.redis_client.ping()
             logger.info(f"Connected to Redis at {host}:{port}")
 
+            # Async client for coroutines, so cache round trips don't block
+            # the event loop. Connections are created lazily by the pool.
+            self.async_redis_client = aioredis.Redis(
+                connection_pool=aioredis.ConnectionPool(
+                    host=host,
+                    port=port,
+                    password=password,
+                    db=db,
+                    decode_responses=False,
+                    socket_timeout=5,
+                    socket_connect_timeout=5,
+                    retry_on_timeout=True,
+                    max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+                )
+            )
+
         except (RedisError, Exception) as e:
             logger.warning(f"Redis connection failed: {e}. Caching disabled.")
             self.redis_client = None
+            self.async_redis_client = None
 
     def _generate_cache_key(self, prefix: str, *args, **kwargs) -> str:
         """Generate a consistent cache key from function arguments"""
@@ -58,46 +224,190 @@ class RedisCache:
         key_hash = hashlib.md5(key_string.encode()).hexdigest()
         return f"{prefix}:{key_hash}"
 
-    def get(self, key: str) -> Optional[Any]:
-        """Get cached data"""
+    def _get_local(self, key: str) -> Optional[CacheEntry]:
+        """Look up the in-process cache and record the outcome"""
+        if not self.local.is_enabled():
+            return None
+        entry = self.local.get(key)
+        if entry is _MISSING:
+            self.stats["l1_misses"] += 1
+            return None
+        self.stats["l1_hits"] += 1
+        return entry
+
+    def _entry_from_redis(
+        self, key: str, cached_data: bytes, pttl: int, local: bool
+    ) -> CacheEntry:
+        """Decode a value read from Redis and populate the in-process cache"""
+        decoded = self.codec.decode(cached_data)
+        entry = CacheEntry(decoded.value, decoded.created_at)
+        self.stats["l2_hits"] += 1
+        # Use the remaining Redis TTL so L1 never outlives the shared entry
+        if local and pttl > 0:
+            self.local.set(key, entry, pttl / 1000, decoded.size)
+        return entry
+
+    def _encode(self, entry: CacheEntry) -> tuple[bytes, int]:
+        """Encode a value for Redis and record its size before/after compression"""
+        encoded_data, size = self.codec.encode(entry.value, entry.created_at)
+        self.stats["bytes_serialized"] += size
+        self.stats["bytes_stored"] += len(encoded_data)
+        if is_compressed(encoded_data):
+            self.stats["bytes_before_compression"] += size
+            self.stats["bytes_after_compression"] += len(encoded_data)
+        return encoded_data, size
+
+    def get_entry(self, key: str, local: bool = True) -> Optional[CacheEntry]:
+        """Get cached data with its creation time, checking L1 before Redis"""
+        if local:
+            entry = self._get_local(key)
+            if entry is not None:
+                return entry
+
         if not self.redis_client:
             return None
 
         try:
-            cached_data = self.redis_client.get(key)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            cached_data, pttl = pipe.execute()
             if cached_data:
-                return json.loads(cached_data)
-        except (RedisError, json.JSONDecodeError) as e:
+                return self._entry_from_redis(key, cached_data, pttl, local)
+            self.stats["l2_misses"] += 1
+        except (RedisError, CacheCodecError) as e:
             logger.warning(f"Cache get error for key {key}: {e}")
 
         return None
 
-    def set(self, key: str, data: Any, ttl: int = 3600) -> bool:
+    def get(self, key: str, local: bool = True) -> Optional[Any]:
+        """Get cached data, checking the in-process cache before Redis"""
+        entry = self.get_entry(key, local=local)
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, data: Any, ttl: int = 3600, local: bool = True) -> bool:
         """Set cached data with TTL (default 1 hour)"""
+        entry = CacheEntry(data, time.time())
+        try:
+            encoded_data, size = self._encode(entry)
+        except Exception as e:
+            # An unencodable value only skips the cache write
+            logger.warning(f"Cache set error for key {key}: {e}")
+            return False
+
+        if local:
+            self.local.set(key, entry, ttl, size)
+
         if not self.redis_client:
             return False
 
         try:
-            serialized_data = json.dumps(data, default=str)
-            self.redis_client.setex(key, ttl, serialized_data)
+            self.redis_client.setex(key, ttl, encoded_data)
             return True
-        except (RedisError, TypeError) as e:
+        except RedisError as e:
             logger.warning(f"Cache set error for key {key}: {e}")
             return False
 
+    async def aget_entry(self, key: str, local: bool = True) -> Optional[CacheEntry]:
+        """Get cached data with its creation time without blocking the event loop"""
+        if local:
+            entry = self._get_local(key)
+            if entry is not None:
+                return entry
+
+        if not self.async_redis_client:
+            return None
+
+        try:
+            async with self.async_redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                cached_data, pttl = await pipe.execute()
+            if cached_data:
+                return self._entry_from_redis(key, cached_data, pttl, local)
+            self.stats["l2_misses"] += 1
+        except (RedisError, CacheCodecError) as e:
+            logger.warning(f"Cache get error for key {key}: {e}")
+
+        return None
+
+    async def aget(self, key: str, local: bool = True) -> Optional[Any]:
+        """Get cached data without blocking the event loop"""
+        entry = await self.aget_entry(key, local=local)
+        return entry.value if entry is not None else None
+
+    async def aset(
+        self, key: str, data: Any, ttl: int = 3600, local: bool = True
+    ) -> bool:
+        """Set cached data with TTL without blocking the event loop"""
+        entry = CacheEntry(data, time.time())
+        try:
+            encoded_data, size = self._encode(entry)
+        except Exception as e:
+            # An unencodable value only skips the cache write
+            logger.warning(f"Cache set error for key {key}: {e}")
+            return False
+
+        if local:
+            self.local.set(key, entry, ttl, size)
+
+        if not self.async_redis_client:
+            return False
+
+        try:
+            await self.async_redis_client.setex(key, ttl, encoded_data)
+            return True
+        except RedisError as e:
+            logger.warning(f"Cache set error for key {key}: {e}")
+            return False
+
+    async def acquire_lock(self, key: str, token: str, ttl: int) -> bool:
+        """Try to take a short-lived lock; always succeeds without Redis"""
+        if not self.async_redis_client:
+            return True
+
+        try:
+            return bool(await self.async_redis_client.set(key, token, nx=True, ex=ttl))
+        except RedisError as e:
+            logger.warning(f"Cache lock error for key {key}: {e}")
+            return True
+
+    async def release_lock(self, key: str, token: str):
+        """Release a lock if it is still held with the given token"""
+        if not self.async_redis_client:
+            return
+
+        try:
+            await self.async_redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token)
+        except RedisError as e:
+            logger.warning(f"Cache unlock error for key {key}: {e}")
+
+    async def is_locked(self, key: str) -> bool:
+        """Check if a lock is currently held"""
+        if not self.async_redis_client:
+            return False
+
+        try:
+            return bool(await self.async_redis_client.exists(key))
+        except RedisError as e:
+            logger.warning(f"Cache lock check error for key {key}: {e}")
+            return False
+
     def delete(self, key: str) -> bool:
         """Delete cached data"""
+        deleted_locally = self.local.delete(key)
         if not self.redis_client:
-            return False
+            return deleted_locally
 
         try:
-            return bool(self.redis_client.delete(key))
+            return bool(self.redis_client.delete(key)) or deleted_locally
         except RedisError as e:
             logger.warning(f"Cache delete error for key {key}: {e}")
             return False
 
     def delete_all(self) -> bool:
-        """Delete all cached data"""
+        """Delete all cached data (the in-process cache of this process only)"""
+        self.local.clear()
         if not self.redis_client:
             return False
 
@@ -115,12 +425,145 @@ class RedisCache:
 # Global cache instance
 cache = RedisCache()
 
+# In-flight computations of async cached functions, by cache key
+_inflight: dict[str, asyncio.Task] = {}
+
+# Background refreshes of stale entries, by cache key
+_refreshing: dict[str, asyncio.Task] = {}
+_sync_refreshing: set[str] = set()
+_sync_refreshing_lock = threading.Lock()
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=REFRESH_CONCURRENCY, thread_name_prefix="cache-refresh"
+)
+
+
+def _should_cache(result: Any, cache_condition: Optional[Callable]) -> bool:
+    """Decide whether a computed result should be stored"""
+    if cache_condition:
+        return bool(cache_condition(result))
+    return not (result is None or (hasattr(result, "__len__") and len(result) == 0))
+
+
+async def _compute_with_lock(cache_key: str, compute: Callable, local: bool) -> Any:
+    """
+    Run compute() while holding a Redis lock for the key, so only one process
+    across all pods computes a given entry. Other processes poll the cache
+    for the result, falling back to computing it themselves if the holder
+    goes away or does not produce a cacheable result in time.
+    """
+    lock_key = f"lock:{cache_key}"
+    token = uuid.uuid4().hex
+    if await cache.acquire_lock(lock_key, token, LOCK_TTL):
+        try:
+            return await compute()
+        finally:
+            await cache.release_lock(lock_key, token)
+
+    cache.stats["lock_waits"] += 1
+    logger.info(f"Waiting for another process to compute key: {cache_key}")
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        cached_result = await cache.aget(cache_key, local=local)
+        if cached_result is not None:
+            return cached_result
+        if not await cache.is_locked(lock_key):
+            break
+
+    return await compute()
+
+
+async def _single_flight(cache_key: str, compute: Callable, local: bool) -> Any:
+    """
+    Coalesce concurrent computations of the same cache key in this process.
+    The first caller starts the computation; later callers await its result.
+    The shared task is shielded so a cancelled caller does not cancel it for
+    the others.
+    """
+    task = _inflight.get(cache_key)
+    if task is not None:
+        cache.stats["coalesced"] += 1
+        logger.info(f"Joining in-flight computation for key: {cache_key}")
+        return await asyncio.shield(task)
+
+    if DISTRIBUTED_LOCK:
+        task = asyncio.ensure_future(_compute_with_lock(cache_key, compute, local))
+    else:
+        task = asyncio.ensure_future(compute())
+    _inflight[cache_key] = task
+    task.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+    return await asyncio.shield(task)
+
+
+def _schedule_refresh(cache_key: str, compute: Callable):
+    """
+    Recompute a stale entry in the background. At most REFRESH_CONCURRENCY
+    refreshes run at once; beyond that, or if the key is already being
+    recomputed, the stale value keeps being served until a later request.
+    """
+    if cache_key in _refreshing or cache_key in _inflight:
+        return
+    if len(_refreshing) >= REFRESH_CONCURRENCY:
+        logger.info(f"Refresh limit reached, not refreshing key: {cache_key}")
+        return
+
+    async def refresh():
+        lock_key = f"lock:{cache_key}"
+        token = uuid.uuid4().hex
+        if DISTRIBUTED_LOCK and not await cache.acquire_lock(lock_key, token, LOCK_TTL):
+            return
+        try:
+            cache.stats["refreshes"] += 1
+            await compute()
+        except Exception:
+            logger.exception(f"Background refresh failed for key: {cache_key}")
+        finally:
+            if DISTRIBUTED_LOCK:
+                await cache.release_lock(lock_key, token)
+
+    task = asyncio.ensure_future(refresh())
+    _refreshing[cache_key] = task
+    task.add_done_callback(lambda _: _refreshing.pop(cache_key, None))
+
+
+def _schedule_sync_refresh(cache_key: str, compute: Callable):
+    """Recompute a stale entry of a sync function on the refresh thread pool"""
+    with _sync_refreshing_lock:
+        if cache_key in _sync_refreshing:
+            return
+        if len(_sync_refreshing) >= REFRESH_CONCURRENCY:
+            logger.info(f"Refresh limit reached, not refreshing key: {cache_key}")
+            return
+        _sync_refreshing.add(cache_key)
+
+    def refresh():
+        try:
+            cache.stats["refreshes"] += 1
+            compute()
+        except Exception:
+            logger.exception(f"Background refresh failed for key: {cache_key}")
+        finally:
+            with _sync_refreshing_lock:
+                _sync_refreshing.discard(cache_key)
+
+    _refresh_executor.submit(refresh)
+
+
+# key_version functions of @cached prefixes, so cache_invalidate() can build
+# the same keys
+_key_versions: dict[str, Callable[[], str]] = {}
+
 
 def cached(
     prefix: str = "default",
     ttl: int = 3600,
     cache_condition: Optional[Callable] = None,
     key_func: Optional[Callable] = None,
+    local: bool = True,
+    single_flight: bool = True,
+    soft_ttl: Optional[int] = None,
+    ignore_kwargs: tuple[str, ...] = (),
+    key_version: Optional[Callable[[], str]] = None,
 ):
     """
     Generalized cache decorator for both sync and async functions.
@@ -130,6 +573,18 @@ def cached(
         ttl: Time-to-live in seconds (default: 3600 = 1 hour)
         cache_condition: Function that determines if result should be cached
         key_func: Custom function to generate cache key from args/kwargs
+        local: Also keep results in the in-process LRU in front of Redis
+        single_flight: For async functions, let concurrent callers with the
+            same cache key share one computation instead of each running it
+            (across pods too when CACHE_DISTRIBUTED_LOCK is set)
+        soft_ttl: Age in seconds after which a cached result is stale. Stale
+            results are returned immediately and recomputed in the background;
+            only after `ttl` (the hard TTL) do callers wait for a recompute.
+        ignore_kwargs: Keyword arguments left out of the generated cache key,
+            for hints that do not change the result
+        key_version: Function returning a version of the data the result
+            depends on, appended to the cache key on every call so that
+            results computed under another version are not reused
 
     Examples:
         @cached(prefix="geocode", ttl=3600)
@@ -139,7 +594,16 @@ def cached(
         @cached(prefix="search", ttl=1800, cache_condition=lambda result: result is not None)
         async def search_func(query: str):
             ...
+
+        @cached(prefix="search", ttl=86400, soft_ttl=1800)
+        async def search_func(query: str):
+            ...
     """
+    if soft_ttl is not None and soft_ttl >= ttl:
+        raise ValueError("soft_ttl must be shorter than ttl")
+
+    if key_version:
+        _key_versions[prefix] = key_version
 
     def decorator(func: Callable) -> Callable:
         # Check if function is async
@@ -158,35 +622,43 @@ def cached(
                 if key_func:
                     cache_key = key_func(*args, **kwargs)
                 else:
-                    cache_key = cache._generate_cache_key(prefix, *args, **kwargs)
+                    key_kwargs = {
+                        k: v for k, v in kwargs.items() if k not in ignore_kwargs
+                    }
+                    cache_key = cache._generate_cache_key(prefix, *args, **key_kwargs)
+                if key_version:
+                    cache_key = f"{cache_key}:{key_version()}"
 
-                # Try to get from cache
-                logger.info(f"Trying to get from cache for key async: {cache_key}")
-                cached_result = cache.get(cache_key)
-                if cached_result is not None:
-                    logger.info(
-                        f"Cache hit for {func.__name__} with key prefix: {prefix}"
-                    )
-                    return cached_result
-
-                # Execute function
-                logger.info(f"Cache miss for {func.__name__} with key prefix: {prefix}")
-                result = await func(*args, **kwargs)
+                async def compute():
+                    # Execute function
+                    result = await func(*args, **kwargs)
 
-                # Check if we should cache this result
-                should_cache = True
-                if cache_condition:
-                    should_cache = cache_condition(result)
-                elif result is None or (
-                    hasattr(result, "__len__") and len(result) == 0
-                ):
-                    should_cache = False
+                    # Cache the result if conditions are met
+                    if _should_cache(result, cache_condition):
+                        await cache.aset(cache_key, result, ttl, local=local)
 
-                # Cache the result if conditions are met
-                if should_cache:
-                    cache.set(cache_key, result, ttl)
+                    return result
 
-                return result
+                # Try to get from cache
+                logger.info(f"Trying to get from cache for key async: {cache_key}")
+                entry = await cache.aget_entry(cache_key, local=local)
+                if entry is not None:
+                    if soft_ttl is not None and entry.is_stale(soft_ttl):
+                        logger.info(
+                            f"Stale cache hit for {func.__name__} with key prefix: {prefix}"
+                        )
+                        cache.stats["stale_hits"] += 1
+                        _schedule_refresh(cache_key, compute)
+                    else:
+                        logger.info(
+                            f"Cache hit for {func.__name__} with key prefix: {prefix}"
+                        )
+                    return entry.value
+
+                logger.info(f"Cache miss for {func.__name__} with key prefix: {prefix}")
+                if single_flight:
+                    return await _single_flight(cache_key, compute, local)
+                return await compute()
 
             return async_wrapper
 
@@ -203,35 +675,41 @@ def cached(
                 if key_func:
                     cache_key = key_func(*args, **kwargs)
                 else:
-                    cache_key = cache._generate_cache_key(prefix, *args, **kwargs)
+                    key_kwargs = {
+                        k: v for k, v in kwargs.items() if k not in ignore_kwargs
+                    }
+                    cache_key = cache._generate_cache_key(prefix, *args, **key_kwargs)
+                if key_version:
+                    cache_key = f"{cache_key}:{key_version()}"
 
-                # Try to get from cache
-                logger.info(f"Trying to get from cache for key sync: {cache_key}")
-                cached_result = cache.get(cache_key)
-                if cached_result is not None:
-                    logger.info(
-                        f"Cache hit for {func.__name__} with key prefix: {prefix}"
-                    )
-                    return cached_result
-
-                # Execute function
-                logger.info(f"Cache miss for {func.__name__} with key prefix: {prefix}")
-                result = func(*args, **kwargs)
+                def compute():
+                    # Execute function
+                    result = func(*args, **kwargs)
+
+                    # Cache the result if conditions are met
+                    if _should_cache(result, cache_condition):
+                        cache.set(cache_key, result, ttl, local=local)
 
-                # Check if we should cache this result
-                should_cache = True
-                if cache_condition:
-                    should_cache = cache_condition(result)
-                elif result is None or (
-                    hasattr(result, "__len__") and len(result) == 0
-                ):
-                    should_cache = False
+                    return result
 
-                # Cache the result if conditions are met
-                if should_cache:
-                    cache.set(cache_key, result, ttl)
+                # Try to get from cache
+                logger.info(f"Trying to get from cache for key sync: {cache_key}")
+                entry = cache.get_entry(cache_key, local=local)
+                if entry is not None:
+                    if soft_ttl is not None and entry.is_stale(soft_ttl):
+                        logger.info(
+                            f"Stale cache hit for {func.__name__} with key prefix: {prefix}"
+                        )
+                        cache.stats["stale_hits"] += 1
+                        _schedule_sync_refresh(cache_key, compute)
+                    else:
+                        logger.info(
+                            f"Cache hit for {func.__name__} with key prefix: {prefix}"
+                        )
+                    return entry.value
 
-                return result
+                logger.info(f"Cache miss for {func.__name__} with key prefix: {prefix}")
+                return compute()
 
             return sync_wrapper
 
@@ -242,6 +720,9 @@ def cached(
 def cache_invalidate(prefix: str, *args, **kwargs) -> bool:
     """Invalidate cache for specific function call"""
     cache_key = cache._generate_cache_key(prefix, *args, **kwargs)
+    key_version = _key_versions.get(prefix)
+    if key_version:
+        cache_key = f"{cache_key}:{key_version()}"
     return cache.delete(cache_key)
 
 
@@ -256,6 +737,14 @@ def cache_status() -> dict:
         "available": cache.is_available(),
         "redis_client": cache.redis_client is not None,
         "disabled": os.getenv("DISABLE_CACHE", "false").lower() == "true",
+        "local": cache.local.status(),
+        "stats": dict(cache.stats),
+        "bytes_saved": cache.stats["bytes_before_compression"]
+        - cache.stats["bytes_after_compression"],
+        "codec": {
+            "serializer": cache.codec.serializer,
+            "compression": cache.codec.compression,
+        },
     }
 
 
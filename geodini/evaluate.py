@@ -0,0 +1,157 @@
+"""
+Offline evaluation of the PostGIS geocoder's subtype ranking weights.
+
+Runs a labeled query set against the database under several weightings and
+reports, for each one, the top-1 accuracy of the ranked candidates and how
+often the LLM reranker would be skipped (and whether the skipped answers are
+right). Skipping depends on the weighted lead of the top candidate, see
+pick_confident_match(); `--margin` evaluates another RERANK_SKIP_MARGIN.
+
+The labeled set is a JSON Lines file with one query per line:
+
+    {"query": "Paris", "expected_id": "..."}
+    {"query": "Bombay", "expected_name": "Mumbai", "expected_country": "IN"}
+
+`country_code` can be set on a line to evaluate with that filter. Weightings
+are a JSON file mapping a name to subtype weights; the weights in the
+subtype_weights table ("current") and no weighting ("unweighted") are always
+included.
+
+    python -m geodini.evaluate queries.jsonl --weightings weightings.json --margin 1
+"""
+
+import argparse
+import json
+import logging
+from typing import Any
+
+import dotenv
+
+from geodini.agents.utils.geocoder import (
+    RERANK_SKIP_MARGIN,
+    geocode,
+    normalize_name,
+    pick_confident_match,
+    refresh_subtype_weights,
+)
+
+
+dotenv.load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def load_labeled_queries(path: str) -> list[dict[str, Any]]:
+    """Read a JSON Lines file of labeled queries"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_expected(candidate: dict[str, Any] | None, labeled: dict[str, Any]) -> bool:
+    """Check a candidate against the expected id, or name and country"""
+    if candidate is None:
+        return False
+    if labeled.get("expected_id"):
+        return candidate["id"] == labeled["expected_id"]
+    if normalize_name(candidate["name"] or "") != normalize_name(
+        labeled["expected_name"]
+    ):
+        return False
+    expected_country = labeled.get("expected_country")
+    return not expected_country or candidate["country"] == expected_country.upper()
+
+
+def evaluate_weighting(
+    labeled_queries: list[dict[str, Any]],
+    weights: dict[str, float],
+    margin: float | None = None,
+) -> dict[str, Any]:
+    """Geocode the labeled queries with one weighting and score the rankings"""
+    correct = 0
+    skipped = 0
+    skipped_correct = 0
+    for labeled in labeled_queries:
+        # Bypass the cache so every weighting hits the database
+        candidates = geocode.__wrapped__(
+            labeled["query"],
+            country_code=labeled.get("country_code"),
+            weights=weights,
+        )
+        if is_expected(candidates[0] if candidates else None, labeled):
+            correct += 1
+        confident_match = pick_confident_match(candidates, margin)
+        if confident_match is not None:
+            skipped += 1
+            if is_expected(confident_match, labeled):
+                skipped_correct += 1
+
+    total = len(labeled_queries)
+    return {
+        "queries": total,
+        "top1_accuracy": correct / total if total else 0.0,
+        "rerank_skip_rate": skipped / total if total else 0.0,
+        "skipped_accuracy": skipped_correct / skipped if skipped else 0.0,
+    }
+
+
+def evaluate(
+    labeled_queries: list[dict[str, Any]],
+    weightings: dict[str, dict[str, float]],
+    margin: float | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Evaluate each named weighting over the labeled queries"""
+    reports = {}
+    for name, weights in weightings.items():
+        logger.info(f"Evaluating weighting {name}: {weights}")
+        reports[name] = evaluate_weighting(labeled_queries, weights, margin)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate subtype ranking weights over a labeled query set"
+    )
+    parser.add_argument("queries", help="JSON Lines file of labeled queries")
+    parser.add_argument(
+        "--weightings", help="JSON file mapping weighting names to subtype weights"
+    )
+    parser.add_argument(
+        "--margin",
+        type=float,
+        help="Weighted lead needed to skip reranking (default RERANK_SKIP_MARGIN)",
+    )
+    parser.add_argument(
+        "--output", help="Write the report as JSON to this file as well"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    labeled_queries = load_labeled_queries(args.queries)
+    weightings = {"current": refresh_subtype_weights(), "unweighted": {}}
+    if args.weightings:
+        with open(args.weightings) as f:
+            weightings.update(json.load(f))
+
+    margin = RERANK_SKIP_MARGIN if args.margin is None else args.margin
+    reports = evaluate(labeled_queries, weightings, margin)
+
+    print(f"{'weighting':<24} {'top-1':>8} {'skip rate':>10} {'skipped ok':>11}")
+    for name, report in reports.items():
+        print(
+            f"{name:<24} {report['top1_accuracy']:>8.1%} "
+            f"{report['rerank_skip_rate']:>10.1%} {report['skipped_accuracy']:>11.1%}"
+        )
+    print(f"{len(labeled_queries)} labeled queries, rerank skip margin {margin}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"weightings": weightings, "margin": margin, "reports": reports},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
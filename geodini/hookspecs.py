@@ -1,14 +1,21 @@
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
 from typing import Any
 
 import pluggy
 
 hookspec = pluggy.HookspecMarker("geodini")
 
+Geocoder = Callable[..., list[dict[str, Any]] | Awaitable[list[dict[str, Any]]]]
+
 
 @hookspec
-def get_geocoders(
-    geocoders: list[Callable[[str, int | None], list[dict[str, Any]]]],
-) -> list[Callable[[str, int | None], list[dict[str, Any]]]]:
-    """Get a list of geocoders"""
+def get_geocoders(geocoders: list[Geocoder]) -> list[Geocoder]:
+    """
+    Get a list of geocoders
+
+    A geocoder takes the query (and optionally `simplify_geometry` and a
+    `country_code` keyword) and returns a list of candidate places. It may be
+    a plain function or a coroutine function. Set a `timeout` attribute
+    (seconds) on it to override the default per-geocoder deadline.
+    """
     pass
@@ -1,17 +1,25 @@
 import glob
+import io
 import json
 import logging
+import multiprocessing
 import os
+import re
+import struct
 import subprocess
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import dotenv
 import geopandas as gpd
-import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 from shapely import wkb
-from sqlalchemy import create_engine, text
+from sqlalchemy import Text, create_engine, text
+from sqlalchemy.dialects.postgresql import ARRAY
 
 
 dotenv.load_dotenv()
@@ -31,19 +39,130 @@ password = os.getenv("POSTGRES_PASSWORD")
 # Add FORCE_RECREATE option
 FORCE_RECREATE = os.getenv("FORCE_RECREATE", "false").lower() in ("true", "1", "yes")
 
-engine = create_engine(f"postgresql://{user}:{password}@{host}:{port}/{database}")
+# "copy" streams parquet batches into staging tables with binary COPY,
+# "pandas" uses the original to_sql/to_postgis loaders
+INGEST_MODE = os.getenv("INGEST_MODE", "copy").lower()
+# Worker processes for COPY loads, and retries per parquet file. Each worker
+# imports the geo stack and holds a batch plus its COPY buffer, so the default
+# is small; os.cpu_count() reports the node's CPUs, not a container's limit
+MAX_DEFAULT_INGEST_WORKERS = 2
+
+
+def default_ingest_workers():
+    """Number of COPY worker processes when INGEST_WORKERS is not set"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, MAX_DEFAULT_INGEST_WORKERS))
+
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS") or default_ingest_workers())
+INGEST_RETRIES = int(os.getenv("INGEST_RETRIES", "2"))
+
+# Overture release to ingest. Tables loaded before releases were recorded, and
+# adopted into the legacy schema, are assumed to hold LEGACY_RELEASE
+OVERTURE_RELEASE = os.getenv("OVERTURE_RELEASE") or "2025-02-19.0"
+LEGACY_RELEASE = "2025-02-19.0"
+# "full" replaces tables with a newer release, "diff" upserts changed rows and
+# deletes removed ones (copy mode only)
+INGEST_STRATEGY = os.getenv("INGEST_STRATEGY", "full").lower()
+
+# Pinned to psycopg2: the COPY loader uses copy_expert(), which psycopg 3
+# cursors lack, and a bare postgresql:// URL may select psycopg 3
+DATABASE_URL = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}"
+engine = create_engine(DATABASE_URL)
+
+# Schema that unqualified table names resolve to, see use_schema()
+current_schema = "public"
+# Versions kept for rollback, including the active one
+INGEST_KEEP_VERSIONS = int(os.getenv("INGEST_KEEP_VERSIONS", "2"))
+VERSION_SCHEMA_PREFIX = "geodini_"
+# Schema that tables loaded directly into public are moved to
+LEGACY_SCHEMA = f"{VERSION_SCHEMA_PREFIX}legacy"
+# Layout of a versioned schema - the tables, columns and views the API reads.
+# Bump it when that changes, so that versions built by older code are rebuilt
+# even if they hold the current release. Legacy tables are format 0
+SCHEMA_FORMAT_VERSION = 1
+# Objects the API reads, exposed in public as views of the active version
+PUBLIC_VIEWS = (
+    "divisions",
+    "division_areas",
+    "division_names",
+    "all_geometries",
+    "search_geometries",
+)
 
 DATA_PATH = os.getenv("DATA_PATH") or "/tmp/data"
 
 # Configuration
 BATCH_SIZE = 10000  # Adjust based on your system's memory
 
-
-class NumpyAwareJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return json.JSONEncoder.default(self, obj)
+# Simplification tolerances (degrees) precomputed as GeoJSON in search_geometries.
+# Keep in sync with SIMPLIFIED_GEOJSON_COLUMNS in agents/utils/geocoder.py
+SIMPLIFIED_GEOJSON_COLUMNS = {
+    0.001: "geojson_simplified_001",
+    0.01: "geojson_simplified_01",
+    0.05: "geojson_simplified_05",
+}
+
+# Initial ranking boost per subtype in the subtype_weights table.
+# Keep in sync with DEFAULT_SUBTYPE_WEIGHTS in agents/utils/geocoder.py
+DEFAULT_SUBTYPE_WEIGHTS = {
+    "country": 2.0,
+    "dependency": 2.0,
+    "macroregion": 2.0,
+    "region": 2.0,
+    "macrocounty": 2.0,
+    "county": 1.0,
+    "localadmin": 1.1,
+    "locality": 0.9,
+    "borough": 0.8,
+    "macrohood": 0.8,
+    "neighborhood": 0.8,
+    "microhood": 0.8,
+}
+
+
+# Column definitions for the tables loaded with COPY
+TABLE_COLUMNS = {
+    "division_areas": {
+        "division_id": "text",
+        "geometry": "geometry(Geometry, 4326)",
+    },
+    "divisions": {
+        "id": "text",
+        "subtype": "text",
+        "names": "text",
+        "country": "text",
+        "hierarchies": "text",
+        "primary_name": "text",
+        "common_en_name": "text",
+        # Normalized primary, common and rule names, for exact matches
+        "name_keys": "text[]",
+    },
+    # One row per name of a division, in any language or variant
+    "division_names": {
+        "division_id": "text",
+        "name": "text",
+        "lang": "text",
+        "kind": "text",
+        "norm": "text",
+    },
+}
+
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+PGCOPY_NULL = struct.pack("!i", -1)
+EWKB_SRID_FLAG = 0x20000000
+TEXT_OID = 25
+
+# names.common as a list, which list kernels support unlike maps
+COMMON_NAMES_TYPE = pa.list_(
+    pa.struct(
+        [pa.field("key", pa.string(), nullable=False), pa.field("value", pa.string())]
+    )
+)
 
 
 def test_database_connection():
@@ -78,6 +197,11 @@ def test_database_connection():
                     logger.error(f"Failed to enable PostGIS: {create_error}")
                     raise
 
+            # Trigram similarity search needs pg_trgm; enable it once here so
+            # the geocoder does not have to on every query.
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+            logger.info("pg_trgm extension is available")
+
             # Test write permissions
             conn.execute(
                 text(
@@ -123,26 +247,32 @@ def get_common_en_name(names_obj):
     return None
 
 
+def release_data_path(data_type):
+    """
+    Local directory for a data type of OVERTURE_RELEASE.
+
+    Data of LEGACY_RELEASE downloaded before paths included the release is used
+    from DATA_PATH/<data type> where it exists, instead of downloading it again.
+    """
+    path = os.path.join(DATA_PATH, OVERTURE_RELEASE, data_type)
+    if OVERTURE_RELEASE == LEGACY_RELEASE and not glob.glob(f"{path}/*.parquet"):
+        legacy_path = os.path.join(DATA_PATH, data_type)
+        if glob.glob(f"{legacy_path}/*.parquet"):
+            return legacy_path
+    return path
+
+
 def check_and_download_data():
-    """Check if data exists in DATA_PATH, if not download from S3. Skip download if tables already exist."""
-    logger.info(f"Checking for data in: {DATA_PATH}")
+    """Check if data exists in DATA_PATH, if not download from S3. Skip download if tables already hold the release."""
+    logger.info(f"Checking for release {OVERTURE_RELEASE} data in: {DATA_PATH}")
 
-    # Check if tables already exist with data (unless FORCE_RECREATE is set)
+    # Check if tables already hold this release (unless FORCE_RECREATE is set)
     if not FORCE_RECREATE:
-        divisions_exists, divisions_count = check_table_exists_with_data("divisions")
-        division_areas_exists, division_areas_count = check_table_exists_with_data(
-            "division_areas"
-        )
+        divisions_release = get_loaded_release("divisions")
+        division_areas_release = get_loaded_release("division_areas")
 
-        if (
-            divisions_exists
-            and division_areas_exists
-            and divisions_count > 0
-            and division_areas_count > 0
-        ):
-            logger.info(
-                f"Tables already exist with data (divisions: {divisions_count:,}, division_areas: {division_areas_count:,})"
-            )
+        if divisions_release == division_areas_release == OVERTURE_RELEASE:
+            logger.info(f"Tables already hold release {OVERTURE_RELEASE}")
             logger.info(
                 "Skipping data download. Set FORCE_RECREATE=true to force re-download."
             )
@@ -151,12 +281,12 @@ def check_and_download_data():
     # Define the required directories and their S3 sources
     data_requirements = {
         "divisions": {
-            "local_path": os.path.join(DATA_PATH, "divisions"),
-            "s3_path": "s3://overturemaps-us-west-2/release/2025-02-19.0/theme=divisions/type=division/",
+            "local_path": release_data_path("divisions"),
+            "s3_path": f"s3://overturemaps-us-west-2/release/{OVERTURE_RELEASE}/theme=divisions/type=division/",
         },
         "division_areas": {
-            "local_path": os.path.join(DATA_PATH, "division_areas"),
-            "s3_path": "s3://overturemaps-us-west-2/release/2025-02-19.0/theme=divisions/type=division_area/",
+            "local_path": release_data_path("division_areas"),
+            "s3_path": f"s3://overturemaps-us-west-2/release/{OVERTURE_RELEASE}/theme=divisions/type=division_area/",
         },
     }
 
@@ -231,6 +361,179 @@ def check_and_download_data():
     logger.info("Data availability check and download completed successfully")
 
 
+def drop_dependent_views(conn):
+    """Drop the views that depend on divisions and division_areas"""
+    # Qualified, so the public views of the active version are never matched
+    conn.execute(text(f"DROP VIEW IF EXISTS {current_schema}.all_geometries;"))
+    conn.execute(
+        text(f"DROP MATERIALIZED VIEW IF EXISTS {current_schema}.search_geometries;")
+    )
+
+
+def use_schema(schema, close=True):
+    """
+    Point the module's engine at a schema, searched before public.
+
+    Pass `close=False` in child processes, where pooled connections belong to
+    the parent and must not be closed.
+    """
+    global engine, current_schema
+    engine.dispose(close=close)
+    engine = create_engine(
+        DATABASE_URL, connect_args={"options": f"-csearch_path={schema},public"}
+    )
+    current_schema = schema
+
+
+def qualified_name(table_name):
+    """Name of a table in the current schema, as recorded in ingest metadata"""
+    return f"{current_schema}.{table_name}"
+
+
+def create_ingest_metadata_tables():
+    """Create the tables that track loaded releases and in-progress loads"""
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+            CREATE TABLE IF NOT EXISTS public.ingest_metadata (
+                table_name text PRIMARY KEY,
+                release text NOT NULL,
+                row_count bigint NOT NULL,
+                completed_at timestamptz NOT NULL DEFAULT now()
+            );
+        """
+            )
+        )
+        # One row per parquet file committed to a staging table
+        conn.execute(
+            text(
+                """
+            CREATE TABLE IF NOT EXISTS public.ingest_checkpoints (
+                table_name text NOT NULL,
+                release text NOT NULL,
+                file_name text NOT NULL,
+                row_count bigint NOT NULL,
+                completed_at timestamptz NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, release, file_name)
+            );
+        """
+            )
+        )
+        # One row per versioned schema; public views point at the active one
+        conn.execute(
+            text(
+                """
+            CREATE TABLE IF NOT EXISTS public.ingest_versions (
+                schema_name text PRIMARY KEY,
+                release text NOT NULL,
+                status text NOT NULL DEFAULT 'building',
+                active boolean NOT NULL DEFAULT false,
+                created_at timestamptz NOT NULL DEFAULT now(),
+                activated_at timestamptz,
+                format_version integer NOT NULL DEFAULT 0
+            );
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            ALTER TABLE public.ingest_versions
+            ADD COLUMN IF NOT EXISTS format_version integer NOT NULL DEFAULT 0;
+        """
+            )
+        )
+
+
+def create_subtype_weights_table():
+    """
+    Create the subtype ranking weights table, seeded with the defaults.
+
+    It lives in public rather than in a versioned schema so that tuned
+    weights survive new releases; existing weights are never overwritten.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+            CREATE TABLE IF NOT EXISTS public.subtype_weights (
+                subtype text PRIMARY KEY,
+                weight double precision NOT NULL
+            );
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            INSERT INTO public.subtype_weights (subtype, weight)
+            VALUES (:subtype, :weight)
+            ON CONFLICT (subtype) DO NOTHING;
+        """
+            ),
+            [
+                {"subtype": subtype, "weight": weight}
+                for subtype, weight in DEFAULT_SUBTYPE_WEIGHTS.items()
+            ],
+        )
+
+
+def get_loaded_release(table_name):
+    """
+    Get the release a table was loaded from, or None if it has no data.
+
+    Tables without a recorded load are incomplete, e.g. left by a crash in
+    pandas mode, and also count as None - except in the legacy schema, whose
+    tables predate load records.
+    """
+    table_exists, row_count = check_table_exists_with_data(table_name)
+    if not table_exists or row_count == 0:
+        return None
+
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                "SELECT release FROM public.ingest_metadata WHERE table_name = :table_name;"
+            ),
+            {"table_name": qualified_name(table_name)},
+        )
+        row = result.fetchone()
+    if row:
+        return row.release
+    if current_schema == LEGACY_SCHEMA:
+        return LEGACY_RELEASE
+    logger.info(
+        f"Table '{table_name}' has no recorded load. Treating it as incomplete."
+    )
+    return None
+
+
+def record_ingest(conn, table_name, row_count):
+    """Record a completed load and clear its checkpoints"""
+    conn.execute(
+        text(
+            """
+        INSERT INTO public.ingest_metadata (table_name, release, row_count)
+        VALUES (:table_name, :release, :row_count)
+        ON CONFLICT (table_name) DO UPDATE SET
+            release = EXCLUDED.release,
+            row_count = EXCLUDED.row_count,
+            completed_at = now();
+    """
+        ),
+        {
+            "table_name": qualified_name(table_name),
+            "release": OVERTURE_RELEASE,
+            "row_count": row_count,
+        },
+    )
+    conn.execute(
+        text("DELETE FROM public.ingest_checkpoints WHERE table_name = :table_name;"),
+        {"table_name": qualified_name(table_name)},
+    )
+
+
 def check_table_exists_with_data(table_name):
     """Check if a table exists and has data"""
     try:
@@ -241,7 +544,7 @@ def check_table_exists_with_data(table_name):
                     """
                 SELECT EXISTS (
                     SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
+                    WHERE table_schema = current_schema() 
                     AND table_name = :table_name
                 );
                 """
@@ -266,14 +569,15 @@ def check_table_exists_with_data(table_name):
         return False, 0
 
 
-def load_division_areas_in_batches():
+def load_division_areas_in_batches(executor=None):
     """Load division areas in batches to avoid memory issues"""
     # Check if table exists and has data
     table_exists, row_count = check_table_exists_with_data("division_areas")
+    loaded_release = get_loaded_release("division_areas")
 
-    if table_exists and row_count > 0 and not FORCE_RECREATE:
+    if loaded_release == OVERTURE_RELEASE and not FORCE_RECREATE:
         logger.info(
-            f"Table 'division_areas' already exists with {row_count:,} rows. Skipping load."
+            f"Table 'division_areas' already holds release {OVERTURE_RELEASE} with {row_count:,} rows. Skipping load."
         )
         logger.info("Set FORCE_RECREATE=true to force recreation of the table.")
         return row_count
@@ -281,15 +585,23 @@ def load_division_areas_in_batches():
     if FORCE_RECREATE and table_exists:
         logger.info("FORCE_RECREATE is set. Will recreate division_areas table.")
 
-    # Drop dependent view before replacing table
-    logger.info("Dropping dependent view before table replacement...")
+    if INGEST_MODE == "copy":
+        diff = (
+            INGEST_STRATEGY == "diff"
+            and loaded_release is not None
+            and not FORCE_RECREATE
+        )
+        return copy_division_areas(executor, diff=diff)
+
+    # Drop dependent views before replacing table
+    logger.info("Dropping dependent views before table replacement...")
     with engine.begin() as conn:
-        conn.execute(text("DROP VIEW IF EXISTS all_geometries;"))
+        drop_dependent_views(conn)
 
     logger.info("Starting to load division areas...")
 
     # Find all parquet files in the directory
-    parquet_files = glob.glob(f"{DATA_PATH}/division_areas/*.parquet")
+    parquet_files = glob.glob(f"{release_data_path('division_areas')}/*.parquet")
     logger.info(f"Found {len(parquet_files)} parquet files to process")
 
     total_areas = 0
@@ -356,20 +668,24 @@ def load_division_areas_in_batches():
                 f"Processed batch {batch_num}: {valid_batch_count} valid areas, {loaded_count} total loaded"
             )
 
+    with engine.begin() as conn:
+        record_ingest(conn, "division_areas", loaded_count)
+
     logger.info(
         f"Completed loading {loaded_count} division areas (from {total_areas} total)"
     )
     return loaded_count
 
 
-def load_divisions_in_batches():
+def load_divisions_in_batches(executor=None):
     """Load divisions in batches with name processing"""
     # Check if table exists and has data
     table_exists, row_count = check_table_exists_with_data("divisions")
+    loaded_release = get_loaded_release("divisions")
 
-    if table_exists and row_count > 0 and not FORCE_RECREATE:
+    if loaded_release == OVERTURE_RELEASE and not FORCE_RECREATE:
         logger.info(
-            f"Table 'divisions' already exists with {row_count:,} rows. Skipping load."
+            f"Table 'divisions' already holds release {OVERTURE_RELEASE} with {row_count:,} rows. Skipping load."
         )
         logger.info("Set FORCE_RECREATE=true to force recreation of the table.")
         return row_count
@@ -377,10 +693,18 @@ def load_divisions_in_batches():
     if FORCE_RECREATE and table_exists:
         logger.info("FORCE_RECREATE is set. Will recreate divisions table.")
 
+    if INGEST_MODE == "copy":
+        diff = (
+            INGEST_STRATEGY == "diff"
+            and loaded_release is not None
+            and not FORCE_RECREATE
+        )
+        return copy_divisions(executor, diff=diff)
+
     logger.info("Starting to load divisions...")
 
     # Find all parquet files in the directory
-    parquet_files = glob.glob(f"{DATA_PATH}/divisions/*.parquet")
+    parquet_files = glob.glob(f"{release_data_path('divisions')}/*.parquet")
     logger.info(f"Found {len(parquet_files)} parquet files to process")
 
     total_divs = 0
@@ -396,10 +720,10 @@ def load_divisions_in_batches():
     columns_to_load = ["id", "subtype", "names", "country", "hierarchies"]
     logger.info(f"Only loading specified columns: {columns_to_load}")
 
-    # Drop dependent view before replacing table
-    logger.info("Dropping dependent view before table replacement...")
+    # Drop dependent views before replacing table
+    logger.info("Dropping dependent views before table replacement...")
     with engine.begin() as conn:
-        conn.execute(text("DROP VIEW IF EXISTS all_geometries;"))
+        drop_dependent_views(conn)
 
     # Process each parquet file
     for file_idx, file_path in enumerate(parquet_files):
@@ -413,34 +737,34 @@ def load_divisions_in_batches():
         for batch in parquet_file.iter_batches(
             batch_size=BATCH_SIZE, columns=columns_to_load
         ):
-            batch_df = pd.DataFrame(batch.to_pandas())
+            batch_df = pd.DataFrame(
+                {
+                    column: batch.column(column).to_pandas()
+                    for column in ["id", "subtype", "country"]
+                }
+            )
 
             # Process names
-            batch_df["primary_name"] = batch_df.names.apply(
-                lambda n: n.get("primary") if n and isinstance(n, dict) else None
-            )
-            batch_df["common_en_name"] = batch_df.names.apply(get_common_en_name)
+            primary_names, common_en_names = derive_name_columns(batch)
+            batch_df["primary_name"] = primary_names.to_pandas()
+            batch_df["common_en_name"] = common_en_names.to_pandas()
+            batch_df["name_keys"] = name_keys_column(batch, explode_names(batch))
 
             # Columns with complex objects that need to be serialized to JSON
-            json_cols = [
-                "names",
-                "hierarchies",
-            ]
-
-            for col in json_cols:
-                if col in batch_df.columns:
-                    batch_df[col] = batch_df[col].apply(
-                        lambda x: (
-                            json.dumps(x, cls=NumpyAwareJSONEncoder)
-                            if x is not None
-                            else None
-                        )
-                    )
+            batch_df["names"] = json_column(batch, "names")
+            batch_df["hierarchies"] = json_column(batch, "hierarchies")
+            batch_df = batch_df[list(TABLE_COLUMNS["divisions"])]
 
             # Use replace for first batch, append for subsequent
             if_exists = "replace" if loaded_count == 0 else "append"
 
-            batch_df.to_sql("divisions", engine, if_exists=if_exists, index=False)
+            batch_df.to_sql(
+                "divisions",
+                engine,
+                if_exists=if_exists,
+                index=False,
+                dtype={"name_keys": ARRAY(Text)},
+            )
             batch_count = len(batch_df)
             loaded_count += batch_count
             batch_num += 1
@@ -449,21 +773,610 @@ def load_divisions_in_batches():
                 f"Loaded batch {batch_num}: {batch_count} divisions, {loaded_count} total loaded"
             )
 
+    with engine.begin() as conn:
+        record_ingest(conn, "divisions", loaded_count)
+
     logger.info(f"Completed loading {loaded_count} divisions")
     return loaded_count
 
 
+def wkb_to_ewkb(geometry: bytes, srid: int = 4326) -> bytes:
+    """Add an SRID to a WKB geometry, as PostGIS expects in binary COPY"""
+    byte_order = "<" if geometry[0] == 1 else ">"
+    (geometry_type,) = struct.unpack(f"{byte_order}I", geometry[1:5])
+    if geometry_type & EWKB_SRID_FLAG:
+        return geometry
+    return (
+        geometry[:1]
+        + struct.pack(f"{byte_order}II", geometry_type | EWKB_SRID_FLAG, srid)
+        + geometry[5:]
+    )
+
+
+def encode_text_array(values) -> bytes:
+    """Encode a list of strings as a binary PostgreSQL text[] value"""
+    if not values:
+        return struct.pack("!iii", 0, 0, TEXT_OID)
+    parts = [struct.pack("!iiiii", 1, 0, TEXT_OID, len(values), 1)]
+    for value in values:
+        value = value.encode()
+        parts.append(struct.pack("!i", len(value)))
+        parts.append(value)
+    return b"".join(parts)
+
+
+def encode_copy_rows(rows) -> bytes:
+    """Encode rows of str/bytes/list/None values in PostgreSQL binary COPY format"""
+    parts = []
+    for row in rows:
+        parts.append(struct.pack("!h", len(row)))
+        for value in row:
+            if value is None:
+                parts.append(PGCOPY_NULL)
+                continue
+            if isinstance(value, str):
+                value = value.encode()
+            elif isinstance(value, list):
+                value = encode_text_array(value)
+            parts.append(struct.pack("!i", len(value)))
+            parts.append(value)
+    return b"".join(parts)
+
+
+def copy_rows(raw_conn, table_name, columns, rows):
+    """Stream rows into a table with binary COPY"""
+    buffer = io.BytesIO()
+    buffer.write(PGCOPY_HEADER)
+    buffer.write(encode_copy_rows(rows))
+    buffer.write(PGCOPY_TRAILER)
+    buffer.seek(0)
+
+    with raw_conn.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)",
+            buffer,
+        )
+
+
+def create_staging_table(table_name):
+    """Create an empty unlogged staging table for a COPY load"""
+    staging_table = f"{table_name}_staging"
+    columns = ", ".join(
+        f"{column} {column_type}"
+        for column, column_type in TABLE_COLUMNS[table_name].items()
+    )
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {current_schema}.{staging_table};"))
+        conn.execute(text(f"CREATE UNLOGGED TABLE {staging_table} ({columns});"))
+        conn.execute(
+            text(
+                "DELETE FROM public.ingest_checkpoints WHERE table_name = :table_name;"
+            ),
+            {"table_name": qualified_name(table_name)},
+        )
+    return staging_table
+
+
+def resume_staging_table(table_name):
+    """
+    Get the checkpointed files of an interrupted load of OVERTURE_RELEASE.
+
+    Returns a mapping of file name to row count, or None if the load cannot be
+    resumed and the staging table has to be recreated.
+    """
+    staging_table = f"{table_name}_staging"
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                "SELECT to_regclass(current_schema() || '.' || :staging_table) IS NOT NULL;"
+            ),
+            {"staging_table": staging_table},
+        )
+        if not result.fetchone()[0]:
+            return None
+
+        result = conn.execute(
+            text(
+                """
+            SELECT file_name, row_count FROM public.ingest_checkpoints
+            WHERE table_name = :table_name AND release = :release;
+        """
+            ),
+            {"table_name": qualified_name(table_name), "release": OVERTURE_RELEASE},
+        )
+        checkpoints = {row.file_name: row.row_count for row in result.fetchall()}
+        if not checkpoints:
+            return None
+
+        # Unlogged tables are emptied after a database crash, so make sure the
+        # staging table still holds what the checkpoints say
+        result = conn.execute(text(f"SELECT COUNT(*) FROM {staging_table};"))
+        staged_count = result.fetchone()[0]
+
+    if staged_count != sum(checkpoints.values()):
+        logger.warning(
+            f"{staging_table} has {staged_count:,} rows but checkpoints record "
+            f"{sum(checkpoints.values()):,}, restarting the load"
+        )
+        return None
+    return checkpoints
+
+
+def swap_in_staging_table(table_name, row_count):
+    """Replace a table with its loaded staging table in one transaction"""
+    staging_table = f"{table_name}_staging"
+
+    # Make the data crash-safe before it goes live
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {staging_table} SET LOGGED;"))
+
+    with engine.begin() as conn:
+        if table_name in ("divisions", "division_areas"):
+            drop_dependent_views(conn)
+        conn.execute(text(f"DROP TABLE IF EXISTS {current_schema}.{table_name};"))
+        conn.execute(text(f"ALTER TABLE {staging_table} RENAME TO {table_name};"))
+        record_ingest(conn, table_name, row_count)
+    logger.info(f"Swapped {staging_table} in as {table_name}")
+
+
+def ensure_divisions_primary_key(conn):
+    """Add a primary key on divisions.id, unless the table already has one"""
+    result = conn.execute(
+        text(
+            """
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'divisions'::regclass AND contype = 'p';
+    """
+        )
+    )
+    if result.fetchone() is None:
+        logger.info("Adding primary key on divisions.id")
+        conn.execute(text("ALTER TABLE divisions ADD PRIMARY KEY (id);"))
+
+
+def apply_staging_diff(table_name, row_count):
+    """
+    Apply a loaded staging table to the live table as a diff.
+
+    Changed divisions are upserted by id and removed ones deleted; division
+    areas and names, which have no key of their own, are matched on the whole
+    row. The live tables and views stay in place, so readers are not
+    interrupted.
+    """
+    staging_table = f"{table_name}_staging"
+    columns = list(TABLE_COLUMNS[table_name])
+
+    with engine.begin() as conn:
+        # Tables loaded by older versions may lack newer columns
+        for column, column_type in TABLE_COLUMNS[table_name].items():
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column} {column_type};"
+                )
+            )
+
+        if table_name == "divisions":
+            ensure_divisions_primary_key(conn)
+            conn.execute(text(f"CREATE INDEX ON {staging_table} (id);"))
+            deleted = conn.execute(
+                text(
+                    f"""
+                DELETE FROM divisions d
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {staging_table} s WHERE s.id = d.id
+                );
+            """
+                )
+            ).rowcount
+            updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+            upserted = conn.execute(
+                text(
+                    f"""
+                INSERT INTO divisions ({", ".join(columns)})
+                SELECT {", ".join(columns)} FROM {staging_table}
+                ON CONFLICT (id) DO UPDATE SET {updates}
+                WHERE ({", ".join(f"divisions.{column}" for column in columns)})
+                    IS DISTINCT FROM
+                    ({", ".join(f"EXCLUDED.{column}" for column in columns)});
+            """
+                )
+            ).rowcount
+        else:
+            # Tables without a key of their own are matched on the whole row
+            conn.execute(text(f"CREATE INDEX ON {staging_table} (division_id);"))
+            same_row = (
+                "s.division_id = t.division_id AND "
+                f"({', '.join(f's.{column}' for column in columns)}) IS NOT DISTINCT FROM "
+                f"({', '.join(f't.{column}' for column in columns)})"
+            )
+            deleted = conn.execute(
+                text(
+                    f"""
+                DELETE FROM {table_name} t
+                WHERE NOT EXISTS (SELECT 1 FROM {staging_table} s WHERE {same_row});
+            """
+                )
+            ).rowcount
+            upserted = conn.execute(
+                text(
+                    f"""
+                INSERT INTO {table_name} ({", ".join(columns)})
+                SELECT {", ".join(f"s.{column}" for column in columns)}
+                FROM {staging_table} s
+                WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE {same_row});
+            """
+                )
+            ).rowcount
+
+        conn.execute(text(f"DROP TABLE {staging_table};"))
+        record_ingest(conn, table_name, row_count)
+
+    logger.info(
+        f"Applied {OVERTURE_RELEASE} to {table_name} as a diff: "
+        f"{upserted:,} rows inserted or updated, {deleted:,} deleted"
+    )
+
+
+def division_area_rows(batch):
+    """Rows for division_areas from a parquet record batch"""
+    division_ids = batch.column("division_id").to_pylist()
+    geometries = batch.column("geometry").to_pylist()
+    # WKB is passed through untouched apart from adding the SRID
+    return [
+        (division_id, wkb_to_ewkb(geometry))
+        for division_id, geometry in zip(division_ids, geometries)
+        if geometry is not None
+    ]
+
+
+def normalize_name_array(names):
+    """
+    Accent-fold, lowercase and collapse whitespace in an Arrow string array.
+
+    Keep in sync with normalize_name() in agents/utils/geocoder.py.
+    """
+    names = pc.utf8_normalize(names, "NFKD")
+    names = pc.replace_substring_regex(names, r"\p{Mn}+", "")
+    names = pc.utf8_lower(names)
+    names = pc.utf8_trim_whitespace(names)
+    return pc.replace_substring_regex(names, r"\s+", " ")
+
+
+def derive_name_columns(batch):
+    """
+    Derive primary_name and common_en_name from a batch's names.
+
+    Uses Arrow compute kernels on the whole batch instead of per-row Python.
+    """
+    names = batch.column("names")
+    if pa.types.is_null(names.type):
+        empty = pa.nulls(len(names), pa.string())
+        return empty, empty
+
+    primary_names = pc.struct_field(names, "primary")
+    common_en_names = pc.map_lookup(
+        pc.struct_field(names, "common"), pa.scalar("en"), "first"
+    )
+    return primary_names, common_en_names
+
+
+def explode_names(batch):
+    """
+    One row per name of each division in a batch.
+
+    Covers the primary name, common names per language and rule names
+    (official, alternate, short, ...). Returns an Arrow table with the batch
+    row, division_id, name, lang, kind and the normalized name as norm.
+    """
+    names = batch.column("names")
+    row_count = len(names)
+    parts = []
+    if not pa.types.is_null(names.type):
+        parts.append(
+            pa.table(
+                {
+                    "row": pa.array(range(row_count), pa.int64()),
+                    "name": pc.struct_field(names, "primary"),
+                    "lang": pa.nulls(row_count, pa.string()),
+                    "kind": pa.repeat(pa.scalar("primary"), row_count),
+                }
+            )
+        )
+        common = pc.struct_field(names, "common").cast(COMMON_NAMES_TYPE)
+        entries = pc.list_flatten(common)
+        parts.append(
+            pa.table(
+                {
+                    "row": pc.list_parent_indices(common).cast(pa.int64()),
+                    "name": pc.struct_field(entries, "value"),
+                    "lang": pc.struct_field(entries, "key"),
+                    "kind": pa.repeat(pa.scalar("common"), len(entries)),
+                }
+            )
+        )
+        if "rules" in names.type.names:
+            rules = pc.struct_field(names, "rules")
+            entries = pc.list_flatten(rules)
+            parts.append(
+                pa.table(
+                    {
+                        "row": pc.list_parent_indices(rules).cast(pa.int64()),
+                        "name": pc.struct_field(entries, "value"),
+                        "lang": pc.struct_field(entries, "language"),
+                        "kind": pc.struct_field(entries, "variant"),
+                    }
+                )
+            )
+
+    if not parts:
+        return pa.table(
+            {
+                column: pa.array([], column_type)
+                for column, column_type in [
+                    ("row", pa.int64()),
+                    ("division_id", pa.string()),
+                    ("name", pa.string()),
+                    ("lang", pa.string()),
+                    ("kind", pa.string()),
+                    ("norm", pa.string()),
+                ]
+            }
+        )
+
+    exploded = pa.concat_tables(parts)
+    exploded = exploded.append_column(
+        "division_id", pc.take(batch.column("id"), exploded["row"])
+    )
+    exploded = exploded.append_column("norm", normalize_name_array(exploded["name"]))
+    return exploded.filter(pc.fill_null(pc.not_equal(exploded["norm"], ""), False))
+
+
+def name_keys_column(batch, exploded_names):
+    """Distinct normalized names of each division in a batch, as lists"""
+    name_keys = [[] for _ in range(batch.num_rows)]
+    grouped = exploded_names.group_by("row").aggregate([("norm", "distinct")])
+    for row, norms in zip(
+        grouped["row"].to_pylist(), grouped["norm_distinct"].to_pylist()
+    ):
+        name_keys[row] = norms
+    return name_keys
+
+
+def division_name_rows(batch):
+    """Rows for division_names from a parquet record batch"""
+    exploded = explode_names(batch).select(list(TABLE_COLUMNS["division_names"]))
+    return list(zip(*(column.to_pylist() for column in exploded.columns)))
+
+
+def json_column(batch, column):
+    """Serialize a nested column to JSON text, one value per row"""
+    # Arrow has no JSON writer kernel; to_pylist yields plain Python objects,
+    # so no numpy-aware encoder is needed
+    return [
+        json.dumps(value) if value is not None else None
+        for value in batch.column(column).to_pylist()
+    ]
+
+
+def division_rows(batch):
+    """Rows for divisions from a parquet record batch"""
+    primary_names, common_en_names = derive_name_columns(batch)
+
+    return list(
+        zip(
+            batch.column("id").to_pylist(),
+            batch.column("subtype").to_pylist(),
+            json_column(batch, "names"),
+            batch.column("country").to_pylist(),
+            json_column(batch, "hierarchies"),
+            primary_names.to_pylist(),
+            common_en_names.to_pylist(),
+            name_keys_column(batch, explode_names(batch)),
+        )
+    )
+
+
+# Parquet data type, parquet columns and row builder for each table loaded with
+# COPY
+COPY_SOURCES = {
+    "division_areas": (
+        "division_areas",
+        ["division_id", "geometry"],
+        division_area_rows,
+    ),
+    "divisions": (
+        "divisions",
+        ["id", "subtype", "names", "country", "hierarchies"],
+        division_rows,
+    ),
+    "division_names": ("divisions", ["id", "names"], division_name_rows),
+}
+
+
+def init_copy_worker(schema):
+    """Set up a COPY worker process"""
+    # Any pooled connections inherited from the parent must not be closed here
+    use_schema(schema, close=False)
+
+
+def copy_file(table_name, file_path):
+    """Copy one parquet file into a table's staging table, retrying on failure"""
+    _, parquet_columns, rows_func = COPY_SOURCES[table_name]
+    staging_table = f"{table_name}_staging"
+    columns = list(TABLE_COLUMNS[table_name])
+
+    for attempt in range(INGEST_RETRIES + 1):
+        raw_conn = engine.raw_connection()
+        try:
+            loaded_count = 0
+            parquet_file = pq.ParquetFile(file_path)
+            for batch in parquet_file.iter_batches(
+                batch_size=BATCH_SIZE, columns=parquet_columns
+            ):
+                rows = rows_func(batch)
+                copy_rows(raw_conn, staging_table, columns, rows)
+                loaded_count += len(rows)
+            # The checkpoint commits with the rows, so a failed attempt leaves
+            # nothing behind and a finished file is never loaded twice
+            with raw_conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO public.ingest_checkpoints
+                        (table_name, release, file_name, row_count)
+                    VALUES (%s, %s, %s, %s);
+                    """,
+                    (
+                        qualified_name(table_name),
+                        OVERTURE_RELEASE,
+                        os.path.basename(file_path),
+                        loaded_count,
+                    ),
+                )
+            raw_conn.commit()
+            return loaded_count
+        except Exception as e:
+            raw_conn.rollback()
+            if attempt == INGEST_RETRIES:
+                raise
+            logger.warning(
+                f"Copying {os.path.basename(file_path)} failed: {e}. "
+                f"Retrying ({attempt + 1}/{INGEST_RETRIES})..."
+            )
+            time.sleep(2**attempt)
+        finally:
+            raw_conn.close()
+
+
+def copy_table(table_name, executor=None, diff=False):
+    """
+    Load a table's parquet files via a staging table and binary COPY.
+
+    Files are copied in parallel by worker processes, each with its own
+    connection. Pass a shared executor to load several tables at once.
+    An interrupted load of the same release resumes from its checkpoints.
+    With `diff`, the staged release is applied to the live table as a diff
+    instead of replacing it.
+    """
+    data_type = COPY_SOURCES[table_name][0]
+    parquet_files = sorted(glob.glob(f"{release_data_path(data_type)}/*.parquet"))
+    logger.info(f"Copying {len(parquet_files)} {table_name} parquet files")
+
+    checkpoints = None if FORCE_RECREATE else resume_staging_table(table_name)
+    if checkpoints:
+        logger.info(
+            f"Resuming {table_name} load: {len(checkpoints)} files already loaded"
+        )
+    else:
+        checkpoints = {}
+        create_staging_table(table_name)
+
+    loaded_count = sum(checkpoints.values())
+    parquet_files = [
+        file_path
+        for file_path in parquet_files
+        if os.path.basename(file_path) not in checkpoints
+    ]
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            initializer=init_copy_worker,
+            initargs=(current_schema,),
+        )
+
+    try:
+        # map yields in file order, so progress is reported in order
+        file_counts = executor.map(
+            copy_file, [table_name] * len(parquet_files), parquet_files
+        )
+        for file_idx, (file_path, file_count) in enumerate(
+            zip(parquet_files, file_counts)
+        ):
+            loaded_count += file_count
+            logger.info(
+                f"Copied file {file_idx + 1}/{len(parquet_files)} "
+                f"({os.path.basename(file_path)}): {loaded_count} {table_name} total loaded"
+            )
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+    if diff:
+        apply_staging_diff(table_name, loaded_count)
+    else:
+        swap_in_staging_table(table_name, loaded_count)
+    logger.info(f"Completed loading {loaded_count} {table_name}")
+    return loaded_count
+
+
+def load_division_names(executor=None):
+    """Load every name variant of each division into division_names"""
+    table_exists, row_count = check_table_exists_with_data("division_names")
+    loaded_release = get_loaded_release("division_names")
+
+    if loaded_release == OVERTURE_RELEASE and not FORCE_RECREATE:
+        logger.info(
+            f"Table 'division_names' already holds release {OVERTURE_RELEASE} with {row_count:,} rows. Skipping load."
+        )
+        return row_count
+
+    if INGEST_MODE == "copy":
+        diff = (
+            INGEST_STRATEGY == "diff"
+            and loaded_release is not None
+            and not FORCE_RECREATE
+        )
+        return copy_table("division_names", executor, diff)
+
+    logger.info("Starting to load division names...")
+    parquet_files = glob.glob(f"{release_data_path('divisions')}/*.parquet")
+
+    loaded_count = 0
+    for file_path in parquet_files:
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(
+            batch_size=BATCH_SIZE, columns=["id", "names"]
+        ):
+            names_df = (
+                explode_names(batch)
+                .select(list(TABLE_COLUMNS["division_names"]))
+                .to_pandas()
+            )
+            if_exists = "replace" if loaded_count == 0 else "append"
+            names_df.to_sql("division_names", engine, if_exists=if_exists, index=False)
+            loaded_count += len(names_df)
+
+        logger.info(
+            f"Loaded names from {os.path.basename(file_path)}: {loaded_count} total loaded"
+        )
+
+    with engine.begin() as conn:
+        record_ingest(conn, "division_names", loaded_count)
+
+    logger.info(f"Completed loading {loaded_count} division names")
+    return loaded_count
+
+
+def copy_division_areas(executor=None, diff=False):
+    """Load division areas with binary COPY"""
+    return copy_table("division_areas", executor, diff)
+
+
+def copy_divisions(executor=None, diff=False):
+    """Load divisions with binary COPY"""
+    return copy_table("divisions", executor, diff)
+
+
 def create_combined_view():
     """Create a view that combines divisions with their geometries"""
     logger.info("Creating combined view...")
 
     with engine.begin() as conn:
-        # Drop existing view if it exists
-        conn.execute(text("DROP VIEW IF EXISTS all_geometries;"))
-
-        # Create view that joins divisions with their areas
+        # Create view that joins divisions with their areas. It is replaced
+        # rather than dropped, as the public view may depend on it
         create_view_sql = """
-        CREATE VIEW all_geometries AS
+        CREATE OR REPLACE VIEW all_geometries AS
         SELECT 
             d.id,
             d.subtype,
@@ -489,6 +1402,340 @@ def create_combined_view():
     return combined_count
 
 
+def create_search_table():
+    """
+    Create the search_geometries materialized view used by the geocoder.
+
+    The divisions/division_areas join is resolved once here instead of on every
+    query. If the view already exists it is refreshed concurrently, so readers
+    are not blocked while it is rebuilt.
+    """
+    expected_columns = {
+        "geojson",
+        "name_keys",
+        *SIMPLIFIED_GEOJSON_COLUMNS.values(),
+    }
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = to_regclass(current_schema() || '.search_geometries')
+            AND attnum > 0 AND NOT attisdropped;
+        """
+            )
+        )
+        columns = {row.attname for row in result.fetchall()}
+        exists = bool(columns)
+
+        # Rebuild views created before a column was added
+        if exists and not expected_columns <= columns:
+            logger.info("search_geometries is missing columns, recreating it")
+            conn.execute(text("DROP MATERIALIZED VIEW search_geometries;"))
+            exists = False
+
+    if exists:
+        logger.info("Refreshing search_geometries materialized view...")
+        with engine.begin() as conn:
+            conn.execute(
+                text("REFRESH MATERIALIZED VIEW CONCURRENTLY search_geometries;")
+            )
+    else:
+        logger.info("Creating search_geometries materialized view...")
+        # GeoJSON is precomputed at several simplification levels so queries
+        # read a column instead of simplifying large polygons every time
+        simplified_columns = ",\n".join(
+            f"            ST_AsGeoJSON(ST_Simplify(geometry, {tolerance})) as {column}"
+            for tolerance, column in SIMPLIFIED_GEOJSON_COLUMNS.items()
+        )
+        # A division can have several areas, e.g. land and maritime; keep the
+        # smallest one, which is the land area
+        create_view_sql = f"""
+        CREATE MATERIALIZED VIEW search_geometries AS
+        SELECT
+            *,
+            ST_AsGeoJSON(geometry) as geojson,
+{simplified_columns}
+        FROM (
+            SELECT DISTINCT ON (d.id)
+                d.id,
+                d.subtype,
+                d.names,
+                d.country,
+                d.hierarchies,
+                d.primary_name,
+                d.common_en_name,
+                d.name_keys,
+                da.geometry,
+                'division'::text as source_type
+            FROM divisions d
+            INNER JOIN division_areas da ON d.id = da.division_id
+            WHERE da.geometry IS NOT NULL
+            ORDER BY d.id, ST_Area(da.geometry)
+        ) areas;
+        """
+
+        index_queries = [
+            # A unique index is required for REFRESH ... CONCURRENTLY
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_search_geometries_id ON search_geometries (id);",
+            "CREATE INDEX IF NOT EXISTS idx_search_geometries_primary_name_trgm ON search_geometries USING gin (primary_name gin_trgm_ops);",
+            "CREATE INDEX IF NOT EXISTS idx_search_geometries_common_en_name_trgm ON search_geometries USING gin (common_en_name gin_trgm_ops);",
+            "CREATE INDEX IF NOT EXISTS idx_search_geometries_geometry ON search_geometries USING gist (geometry);",
+            # Exact matches on the normalized name
+            "CREATE INDEX IF NOT EXISTS idx_search_geometries_name_keys ON search_geometries USING gin (name_keys);",
+            "CREATE INDEX IF NOT EXISTS idx_search_geometries_subtype ON search_geometries (subtype);",
+            "CREATE INDEX IF NOT EXISTS idx_search_geometries_country ON search_geometries (country);",
+        ]
+
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+            conn.execute(text(create_view_sql))
+            for query in index_queries:
+                conn.execute(text(query))
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE search_geometries;"))
+        result = conn.execute(text("SELECT COUNT(*) FROM search_geometries;"))
+        search_count = result.fetchone()[0]
+
+    logger.info(f"search_geometries has {search_count} records")
+    return search_count
+
+
+def analyze_tables():
+    """Update planner statistics for the loaded tables"""
+    with engine.begin() as conn:
+        for table_name in ("divisions", "division_areas", "division_names"):
+            conn.execute(text(f"ANALYZE {table_name};"))
+
+
+def get_active_version():
+    """Get the active versioned schema, or None"""
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+            SELECT schema_name, release, format_version
+            FROM public.ingest_versions WHERE active;
+        """
+            )
+        )
+        return result.fetchone()
+
+
+def adopt_legacy_tables():
+    """
+    Move tables loaded directly into public into a versioned schema.
+
+    Runs once, in one transaction, so that public can hold views of the
+    active version. The legacy version is recorded with format version 0, so
+    the next ingest builds a complete schema for the current code.
+    """
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+            SELECT 1 FROM information_schema.tables
+            WHERE table_schema = 'public' AND table_name = 'divisions'
+            AND table_type = 'BASE TABLE';
+        """
+            )
+        )
+        if result.fetchone() is None:
+            return
+
+        result = conn.execute(
+            text(
+                """
+            SELECT release FROM public.ingest_metadata
+            WHERE table_name IN ('divisions', 'public.divisions');
+        """
+            )
+        )
+        row = result.fetchone()
+        release = row.release if row else LEGACY_RELEASE
+        schema = LEGACY_SCHEMA
+        logger.info(f"Moving existing tables to schema {schema}")
+
+        conn.execute(text(f"CREATE SCHEMA {schema};"))
+        conn.execute(text(f"ALTER TABLE public.divisions SET SCHEMA {schema};"))
+        conn.execute(text(f"ALTER TABLE public.division_areas SET SCHEMA {schema};"))
+        conn.execute(
+            text(f"ALTER VIEW IF EXISTS public.all_geometries SET SCHEMA {schema};")
+        )
+        conn.execute(
+            text(
+                f"ALTER MATERIALIZED VIEW IF EXISTS public.search_geometries SET SCHEMA {schema};"
+            )
+        )
+        conn.execute(
+            text(
+                """
+            INSERT INTO public.ingest_versions
+                (schema_name, release, status, format_version)
+            VALUES (:schema, :release, 'ready', 0);
+        """
+            ),
+            {"schema": schema, "release": release},
+        )
+        conn.execute(
+            text(
+                """
+            UPDATE public.ingest_metadata SET table_name = :schema || '.' || table_name
+            WHERE table_name IN ('divisions', 'division_areas');
+        """
+            ),
+            {"schema": schema},
+        )
+        point_public_views(conn, schema)
+
+
+def start_version():
+    """
+    Get the schema to build OVERTURE_RELEASE into.
+
+    Resumes an interrupted build of the same release unless FORCE_RECREATE
+    is set, otherwise creates a new schema.
+    """
+    with engine.begin() as conn:
+        if not FORCE_RECREATE:
+            result = conn.execute(
+                text(
+                    """
+                SELECT schema_name FROM public.ingest_versions
+                WHERE release = :release AND status = 'building'
+                AND format_version = :format_version
+                ORDER BY created_at DESC LIMIT 1;
+            """
+                ),
+                {"release": OVERTURE_RELEASE, "format_version": SCHEMA_FORMAT_VERSION},
+            )
+            row = result.fetchone()
+            if row:
+                logger.info(f"Resuming build of schema {row.schema_name}")
+                return row.schema_name
+
+        release_slug = re.sub(r"\W", "_", OVERTURE_RELEASE).lower()
+        schema = (
+            f"{VERSION_SCHEMA_PREFIX}{release_slug}_{time.strftime('%Y%m%d%H%M%S')}"
+        )
+        conn.execute(text(f"CREATE SCHEMA {schema};"))
+        conn.execute(
+            text(
+                """
+            INSERT INTO public.ingest_versions (schema_name, release, format_version)
+            VALUES (:schema, :release, :format_version);
+        """
+            ),
+            {
+                "schema": schema,
+                "release": OVERTURE_RELEASE,
+                "format_version": SCHEMA_FORMAT_VERSION,
+            },
+        )
+    logger.info(f"Building release {OVERTURE_RELEASE} into schema {schema}")
+    return schema
+
+
+def point_public_views(conn, schema):
+    """
+    Point the public views at a versioned schema and mark it active.
+
+    Only relations that exist in the schema are exposed; older versions,
+    such as the legacy one, lack some of them.
+    """
+    for name in PUBLIC_VIEWS:
+        conn.execute(text(f"DROP VIEW IF EXISTS public.{name};"))
+        exists = conn.execute(
+            text("SELECT to_regclass(:relation) IS NOT NULL;"),
+            {"relation": f"{schema}.{name}"},
+        ).scalar()
+        if exists:
+            conn.execute(
+                text(f"CREATE VIEW public.{name} AS SELECT * FROM {schema}.{name};")
+            )
+    conn.execute(
+        text(
+            """
+        UPDATE public.ingest_versions SET
+            active = (schema_name = :schema),
+            activated_at = CASE WHEN schema_name = :schema THEN now() ELSE activated_at END
+        WHERE active OR schema_name = :schema;
+    """
+        ),
+        {"schema": schema},
+    )
+
+
+def activate_version(schema):
+    """Atomically switch the public views to a fully built schema"""
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "UPDATE public.ingest_versions SET status = 'ready' WHERE schema_name = :schema;"
+            ),
+            {"schema": schema},
+        )
+        point_public_views(conn, schema)
+    logger.info(f"Activated schema {schema}")
+
+
+def rollback_version():
+    """Switch the public views back to the previously active schema"""
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+            SELECT schema_name FROM public.ingest_versions
+            WHERE status = 'ready' AND NOT active AND activated_at IS NOT NULL
+            AND format_version = :format_version
+            ORDER BY activated_at DESC LIMIT 1;
+        """
+            ),
+            {"format_version": SCHEMA_FORMAT_VERSION},
+        )
+        row = result.fetchone()
+        if row is None:
+            logger.error(
+                "No previous version in the current schema format to roll back to"
+            )
+            return None
+        point_public_views(conn, row.schema_name)
+    logger.info(f"Rolled back to schema {row.schema_name}")
+    return row.schema_name
+
+
+def prune_versions():
+    """Drop all but the INGEST_KEEP_VERSIONS most recently active schemas"""
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+            SELECT schema_name FROM public.ingest_versions
+            WHERE NOT active
+            ORDER BY (status = 'ready') DESC, activated_at DESC NULLS LAST, created_at DESC
+            OFFSET :keep;
+        """
+            ),
+            {"keep": max(INGEST_KEEP_VERSIONS - 1, 0)},
+        )
+        schemas = [row.schema_name for row in result.fetchall()]
+        for schema in schemas:
+            logger.info(f"Dropping old schema {schema}")
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE;"))
+            conn.execute(
+                text("DELETE FROM public.ingest_versions WHERE schema_name = :schema;"),
+                {"schema": schema},
+            )
+            for metadata_table in ("ingest_metadata", "ingest_checkpoints"):
+                conn.execute(
+                    text(
+                        f"DELETE FROM public.{metadata_table} WHERE table_name LIKE :prefix;"
+                    ),
+                    {"prefix": f"{schema}.%"},
+                )
+
+
 def check_common_name_data():
     """Check if common_en_name column has any data"""
     logger.info("Checking common_en_name data availability...")
@@ -597,8 +1844,8 @@ def test_query(place_name):
             ELSE 'common_en_name'
         END as best_match_field,
         -- Simplified geometry as GeoJSON (only for top result)
-        ST_AsGeoJSON(ST_Simplify(geometry, 0.05)) as simplified_geometry
-    FROM all_geometries
+        geojson_simplified_05 as simplified_geometry
+    FROM search_geometries
     WHERE 
         -- Use trigram similarity operator (% means similar to)
         (primary_name % :place_name OR common_en_name % :place_name)
@@ -671,6 +1918,11 @@ def create_trigram_indexes():
                 "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_divisions_subtype ON divisions (subtype);",
                 "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_divisions_country ON divisions (country);",
                 "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_division_areas_division_id ON division_areas (division_id);",
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_division_areas_geometry ON division_areas USING gist (geometry);",
+                # Name variants: fuzzy matches on the normalized name. Exact
+                # matches are served by search_geometries.name_keys
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_division_names_norm_trgm ON division_names USING gin (norm gin_trgm_ops);",
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_division_names_division_id ON division_names (division_id);",
             ]
 
             for idx, query in enumerate(index_queries, 1):
@@ -685,13 +1937,16 @@ def create_trigram_indexes():
                 except Exception as e:
                     logger.warning(f"Index creation warning (may already exist): {e}")
 
+            ensure_divisions_primary_key(conn)
+
             # Check what indexes were created
             result = conn.execute(
                 text(
                     """
                 SELECT indexname, tablename 
                 FROM pg_indexes 
-                WHERE tablename IN ('divisions', 'division_areas') 
+                WHERE schemaname = current_schema()
+                AND tablename IN ('divisions', 'division_areas') 
                 AND indexname LIKE '%trgm%'
                 ORDER BY tablename, indexname;
             """
@@ -712,7 +1967,8 @@ def create_trigram_indexes():
                     """
                 SELECT indexname, tablename, indexdef 
                 FROM pg_indexes 
-                WHERE tablename IN ('divisions', 'division_areas') 
+                WHERE schemaname = current_schema()
+                AND tablename IN ('divisions', 'division_areas') 
                 ORDER BY tablename, indexname;
             """
                 )
@@ -730,8 +1986,43 @@ def create_trigram_indexes():
         raise
 
 
+def load_tables():
+    """Load divisions, division_areas and division_names into the current schema"""
+    if INGEST_MODE == "copy":
+        # Load the tables concurrently, sharing one pool of COPY workers. They
+        # are spawned rather than forked: the pool starts them lazily from a
+        # loader thread, and forking while other threads hold the logging or
+        # connection pool locks can deadlock the children
+        with ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_copy_worker,
+            initargs=(current_schema,),
+        ) as executor, ThreadPoolExecutor(max_workers=3) as loaders:
+            areas_future = loaders.submit(load_division_areas_in_batches, executor)
+            divs_future = loaders.submit(load_divisions_in_batches, executor)
+            names_future = loaders.submit(load_division_names, executor)
+            return areas_future.result(), divs_future.result(), names_future.result()
+
+    # Load division areas in batches
+    areas_count = load_division_areas_in_batches()
+
+    # Load divisions in batches
+    divs_count = load_divisions_in_batches()
+
+    names_count = load_division_names()
+    return areas_count, divs_count, names_count
+
+
 def main():
-    """Main execution function"""
+    """
+    Main execution function
+
+    A release is built into a new versioned schema - tables, views, indexes
+    and statistics - while the API keeps reading the active one through views
+    in public, which are then switched over in one transaction. The previous
+    schema is kept, so `python geodini/ingest.py rollback` switches back.
+    """
     logger.info("Starting geodini data ingestion...")
 
     if FORCE_RECREATE:
@@ -747,24 +2038,82 @@ def main():
         sys.exit(1)
 
     logger.info("Database connection test passed. Proceeding with ingestion...")
+    create_ingest_metadata_tables()
+    create_subtype_weights_table()
+    adopt_legacy_tables()
+
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        if rollback_version() is None:
+            sys.exit(1)
+        return
+
+    logger.info(f"Ingesting Overture release {OVERTURE_RELEASE}")
+    active_version = get_active_version()
+    active_is_current = (
+        active_version is not None
+        and active_version.format_version >= SCHEMA_FORMAT_VERSION
+    )
+    if active_version and not active_is_current:
+        logger.info(
+            f"Schema {active_version.schema_name} has format version "
+            f"{active_version.format_version}, older than {SCHEMA_FORMAT_VERSION}. "
+            "Building a new schema."
+        )
+    if (
+        active_is_current
+        and active_version.release == OVERTURE_RELEASE
+        and not FORCE_RECREATE
+    ):
+        logger.info(
+            f"Release {OVERTURE_RELEASE} is already active in schema "
+            f"{active_version.schema_name}. Set FORCE_RECREATE=true to rebuild it."
+        )
+        return
 
     try:
+        if (
+            INGEST_STRATEGY == "diff"
+            and INGEST_MODE == "copy"
+            and active_is_current
+            and not FORCE_RECREATE
+        ):
+            # Diffs are applied to the active schema in place
+            new_schema = None
+            use_schema(active_version.schema_name)
+        else:
+            new_schema = start_version()
+            use_schema(new_schema)
+
         # Check and download data if needed
         check_and_download_data()
 
-        # Load division areas in batches
-        areas_count = load_division_areas_in_batches()
-
-        # Load divisions in batches
-        divs_count = load_divisions_in_batches()
+        areas_count, divs_count, names_count = load_tables()
 
         # Create combined view
         combined_count = create_combined_view()
 
+        # Create or refresh the materialized search table
+        search_count = create_search_table()
+
+        # Create trigram indexes and statistics before the schema goes live
+        create_trigram_indexes()
+        analyze_tables()
+
+        if new_schema:
+            activate_version(new_schema)
+            prune_versions()
+        else:
+            # Expose tables a diff may have added to the active schema
+            with engine.begin() as conn:
+                point_public_views(conn, current_schema)
+
         logger.info("=== INGESTION SUMMARY ===")
+        logger.info(f"Schema: {current_schema}")
         logger.info(f"Division areas available: {areas_count:,}")
         logger.info(f"Divisions available: {divs_count:,}")
+        logger.info(f"Division names available: {names_count:,}")
         logger.info(f"Combined records available: {combined_count:,}")
+        logger.info(f"Search records available: {search_count:,}")
         logger.info("Ingestion completed successfully!")
 
         # Check common name data availability
@@ -781,9 +2130,6 @@ def main():
                 logger.info("No results found")
             logger.info("---")
 
-        # Create trigram indexes
-        create_trigram_indexes()
-
     except Exception as e:
         logger.error(f"Error during ingestion: {str(e)}")
         raise
@@ -0,0 +1,290 @@
+"""
+Registry of the geocoders provided by geodini plugins.
+
+Plugin discovery and geocoder introspection happen once per process. Requests
+reuse the resulting descriptors and a shared, bounded thread pool instead of
+rescanning entry points and creating executors every time.
+
+Geocoders may be plain functions, which run on the thread pool, or coroutine
+functions, which run on the event loop. Each call is bounded by a deadline -
+the geocoder's `timeout` attribute or GEOCODER_TIMEOUT - and all geocoders
+share a request budget (GEOCODER_BUDGET). Candidates that arrive in time are
+returned even when other geocoders time out.
+
+Geocoders that accept a `country_code` keyword are given the country the
+query was resolved to, so they can narrow their search.
+
+Geocoders can return candidates without geometry and expose a batched
+`fetch_geometries(ids, simplify_geometry)` attribute, which is used to fetch
+geometry only for the candidates that are actually returned.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import threading
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, NamedTuple, Optional
+
+import pluggy
+
+from geodini import hookspecs, lib
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds; 0 disables the limit
+GEOCODER_TIMEOUT = float(os.getenv("GEOCODER_TIMEOUT", "10"))
+GEOCODER_BUDGET = float(os.getenv("GEOCODER_BUDGET", "15"))
+
+# Timeouts and errors per geocoder, keyed like "<geocoder>:timeout"
+geocoder_stats: Counter = Counter()
+
+
+@dataclass(frozen=True)
+class GeocoderDescriptor:
+    name: str
+    func: Callable[..., Any]
+    supports_simplify_geometry: bool
+    supports_country_code: bool
+    is_async: bool
+    # Seconds, or None for no per-geocoder limit
+    timeout: Optional[float]
+    # Batched geometry lookup for candidates returned without geometry
+    fetch_geometries: Optional[Callable[..., Any]] = None
+
+
+class GeocoderResults(NamedTuple):
+    results: list[dict[str, Any]]
+    # Names of geocoders that missed their deadline or the request budget
+    timed_out: list[str]
+    # Names of geocoders that raised an error
+    failed: list[str]
+    # Geocoder that returned each candidate, by candidate id
+    sources: dict[str, GeocoderDescriptor]
+
+
+def _limit(seconds: Optional[float]) -> Optional[float]:
+    return seconds if seconds and seconds > 0 else None
+
+
+_registry: list[GeocoderDescriptor] | None = None
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def get_plugin_manager():
+    pm = pluggy.PluginManager("geodini")
+    pm.add_hookspecs(hookspecs)
+    pm.load_setuptools_entrypoints("geodini")
+    pm.register(lib)
+    return pm
+
+
+def describe_geocoder(geocoder: Callable) -> GeocoderDescriptor:
+    """Inspect a geocoder callable once and record how to call it"""
+    name = getattr(geocoder, "__qualname__", None) or repr(geocoder)
+    module = getattr(geocoder, "__module__", None)
+    if module:
+        name = f"{module}.{name}"
+
+    try:
+        parameters = inspect.signature(geocoder).parameters
+        supports_simplify_geometry = "simplify_geometry" in parameters
+        supports_country_code = "country_code" in parameters
+    except (TypeError, ValueError):
+        supports_simplify_geometry = False
+        supports_country_code = False
+
+    timeout = getattr(geocoder, "timeout", None)
+    return GeocoderDescriptor(
+        name=name,
+        func=geocoder,
+        supports_simplify_geometry=supports_simplify_geometry,
+        supports_country_code=supports_country_code,
+        is_async=inspect.iscoroutinefunction(geocoder),
+        timeout=_limit(float(timeout) if timeout is not None else GEOCODER_TIMEOUT),
+        fetch_geometries=getattr(geocoder, "fetch_geometries", None),
+    )
+
+
+def get_geocoders() -> list[GeocoderDescriptor]:
+    """Get descriptors for all plugin geocoders, discovering them on first use"""
+    global _registry
+    if _registry is not None:
+        return _registry
+
+    with _lock:
+        if _registry is None:
+            pm = get_plugin_manager()
+            geocoder_groups = pm.hook.get_geocoders(geocoders=list())
+            _registry = [
+                describe_geocoder(geocoder)
+                for geocoder_group in geocoder_groups
+                for geocoder in geocoder_group
+            ]
+            logger.info(f"Geocoders: {[geocoder.name for geocoder in _registry]}")
+    return _registry
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the shared thread pool for running geocoders (GEOCODER_MAX_WORKERS)"""
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("GEOCODER_MAX_WORKERS", "8")),
+                thread_name_prefix="geocoder",
+            )
+    return _executor
+
+
+def init_geocoders():
+    """Discover geocoders and create the executor ahead of the first request"""
+    get_geocoders()
+    get_executor()
+
+
+def shutdown_geocoders():
+    """Shut down the shared executor"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _call_geocoder(
+    geocoder: GeocoderDescriptor,
+    query: str,
+    simplify_geometry: bool,
+    country_code: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    kwargs = {}
+    if geocoder.supports_simplify_geometry:
+        kwargs["simplify_geometry"] = simplify_geometry
+    if country_code and geocoder.supports_country_code:
+        kwargs["country_code"] = country_code
+
+    if geocoder.is_async:
+        call = geocoder.func(query, **kwargs)
+    else:
+        # A timed out thread keeps running until the geocoder returns, but its
+        # result is discarded
+        call = asyncio.get_running_loop().run_in_executor(
+            get_executor(), functools.partial(geocoder.func, query, **kwargs)
+        )
+    return await asyncio.wait_for(call, timeout=geocoder.timeout)
+
+
+async def run_geocoders(
+    query: str,
+    simplify_geometry: bool = True,
+    budget: Optional[float] = None,
+    country_code: Optional[str] = None,
+) -> GeocoderResults:
+    """
+    Run all geocoders concurrently and merge the results that arrive in time.
+
+    `budget` caps the whole call in seconds and defaults to GEOCODER_BUDGET.
+    `country_code` is passed to the geocoders that accept it.
+    """
+    tasks = {
+        asyncio.create_task(
+            _call_geocoder(geocoder, query, simplify_geometry, country_code)
+        ): geocoder
+        for geocoder in get_geocoders()
+    }
+    if not tasks:
+        return GeocoderResults([], [], [], {})
+
+    budget = _limit(GEOCODER_BUDGET if budget is None else budget)
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=budget)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    results = []
+    timed_out = []
+    failed = []
+    sources = {}
+    error = None
+    for task in pending:
+        task.cancel()
+        timed_out.append(tasks[task].name)
+    for task, geocoder in tasks.items():
+        if task not in done:
+            continue
+        try:
+            geocoder_results = task.result()
+        except asyncio.TimeoutError:
+            timed_out.append(geocoder.name)
+        except Exception as e:
+            logger.error(f"Geocoder {geocoder.name} failed: {e}")
+            failed.append(geocoder.name)
+            error = error or e
+        else:
+            results.extend(geocoder_results)
+            for result in geocoder_results:
+                sources[result["id"]] = geocoder
+
+    for name in timed_out:
+        geocoder_stats[f"{name}:timeout"] += 1
+    for name in failed:
+        geocoder_stats[f"{name}:error"] += 1
+    if timed_out:
+        logger.warning(f"Geocoders timed out for {query}: {timed_out}")
+    # Only surface errors when no geocoder could answer at all
+    if len(failed) == len(tasks):
+        raise error
+
+    return GeocoderResults(results, timed_out, failed, sources)
+
+
+async def fetch_geometries(
+    geocoder_results: GeocoderResults, ids: list[str], simplify_geometry: bool = True
+) -> dict[str, Any]:
+    """
+    Fetch geometries for candidates returned without one.
+
+    Ids are batched per geocoder and looked up with its `fetch_geometries`.
+    Returns a mapping of id to geometry; ids whose geocoder cannot fetch
+    geometries are left out.
+    """
+    batches: dict[GeocoderDescriptor, list[str]] = {}
+    for id in ids:
+        geocoder = geocoder_results.sources.get(id)
+        if geocoder is not None and geocoder.fetch_geometries is not None:
+            batches.setdefault(geocoder, []).append(id)
+    if not batches:
+        return {}
+
+    loop = asyncio.get_running_loop()
+    calls = []
+    for geocoder, batch in batches.items():
+        if inspect.iscoroutinefunction(geocoder.fetch_geometries):
+            calls.append(geocoder.fetch_geometries(batch, simplify_geometry))
+        else:
+            calls.append(
+                loop.run_in_executor(
+                    get_executor(),
+                    functools.partial(
+                        geocoder.fetch_geometries, batch, simplify_geometry
+                    ),
+                )
+            )
+
+    geometries = {}
+    for batch_geometries in await asyncio.gather(*calls):
+        geometries.update(batch_geometries)
+    return geometries
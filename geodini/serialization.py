@@ -0,0 +1,174 @@
+"""
+Serialization of cached values.
+
+Encoded values start with a short header - magic bytes, format version,
+serializer id, compression id and (from version 2) the creation timestamp -
+so entries written with one configuration can still be read after the
+defaults change, and formats can be rolled forward by bumping FORMAT_VERSION.
+Values without the header are legacy JSON text.
+"""
+
+import json
+import logging
+import struct
+import zlib
+from typing import Any, NamedTuple, Optional
+
+import msgpack
+import zstandard
+from shapely import wkb
+from shapely.errors import ShapelyError
+from shapely.geometry import mapping, shape
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GD"
+FORMAT_VERSION = 2
+# Versions 1 and 2 share the id bytes; version 2 appends the creation time
+HEADER_SIZE = len(MAGIC) + 3
+CREATED_AT = struct.Struct(">d")
+
+SERIALIZERS = {"json": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+# msgpack extension type for GeoJSON geometries stored as WKB
+GEOMETRY_EXT_TYPE = 1
+
+
+class CacheCodecError(ValueError):
+    """Raised when a cached value cannot be decoded"""
+
+
+class DecodedValue(NamedTuple):
+    value: Any
+    # Serialized size before compression
+    size: int
+    # Unix time the value was computed, if recorded
+    created_at: Optional[float]
+
+
+def _is_geojson_geometry(obj: dict) -> bool:
+    return len(obj) == 2 and isinstance(obj.get("type"), str) and "coordinates" in obj
+
+
+def _pack_geometries(obj: Any) -> Any:
+    """Replace GeoJSON geometries with msgpack WKB extension values"""
+    if isinstance(obj, dict):
+        if _is_geojson_geometry(obj):
+            try:
+                return msgpack.ExtType(GEOMETRY_EXT_TYPE, shape(obj).wkb)
+            except (ValueError, TypeError, AttributeError, ShapelyError):
+                pass
+        return {key: _pack_geometries(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_pack_geometries(value) for value in obj]
+    return obj
+
+
+def is_compressed(raw: bytes) -> bool:
+    """Whether an encoded value has a compressed payload"""
+    return raw.startswith(MAGIC) and raw[HEADER_SIZE - 1] != COMPRESSIONS["none"]
+
+
+def _unpack_ext(code: int, data: bytes) -> Any:
+    if code == GEOMETRY_EXT_TYPE:
+        return mapping(wkb.loads(data))
+    return msgpack.ExtType(code, data)
+
+
+class CacheCodec:
+    """Encodes and decodes cached values with a serializer and compression"""
+
+    def __init__(
+        self,
+        serializer: str = "msgpack",
+        compression: str = "zstd",
+        min_compress_bytes: int = 1024,
+    ):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        if compression == "lz4" and lz4_frame is None:
+            logger.warning("lz4 is not installed, falling back to zstd compression")
+            compression = "zstd"
+
+        self.serializer = serializer
+        self.compression = compression
+        self.min_compress_bytes = min_compress_bytes
+
+    def _serialize(self, data: Any) -> bytes:
+        if self.serializer == "msgpack":
+            return msgpack.packb(_pack_geometries(data), use_bin_type=True)
+        return json.dumps(data).encode()
+
+    def _compress(self, payload: bytes) -> tuple[str, bytes]:
+        if self.compression == "none" or len(payload) < self.min_compress_bytes:
+            return "none", payload
+        if self.compression == "zlib":
+            return "zlib", zlib.compress(payload)
+        if self.compression == "lz4":
+            return "lz4", lz4_frame.compress(payload)
+        # zstd (de)compressor objects are not thread-safe, so use one per call
+        return "zstd", zstandard.ZstdCompressor().compress(payload)
+
+    def encode(self, data: Any, created_at: float) -> tuple[bytes, int]:
+        """
+        Encode a value for storage.
+
+        Returns the encoded bytes and the serialized size before compression.
+        Raises TypeError for values that cannot be represented losslessly.
+        """
+        payload = self._serialize(data)
+        compression, compressed = self._compress(payload)
+        header = MAGIC + bytes(
+            [FORMAT_VERSION, SERIALIZERS[self.serializer], COMPRESSIONS[compression]]
+        )
+        return header + CREATED_AT.pack(created_at) + compressed, len(payload)
+
+    def decode(self, raw: bytes | str) -> DecodedValue:
+        """Decode a stored value in any known format"""
+        try:
+            if isinstance(raw, str) or not raw.startswith(MAGIC):
+                return DecodedValue(json.loads(raw), len(raw), None)
+
+            version, serializer_id, compression_id = raw[len(MAGIC) : HEADER_SIZE]
+            if version == 1:
+                created_at = None
+                payload = raw[HEADER_SIZE:]
+            elif version == 2:
+                payload_start = HEADER_SIZE + CREATED_AT.size
+                (created_at,) = CREATED_AT.unpack(raw[HEADER_SIZE:payload_start])
+                payload = raw[payload_start:]
+            else:
+                raise CacheCodecError(f"Unsupported cache format version: {version}")
+
+            if compression_id == COMPRESSIONS["zlib"]:
+                payload = zlib.decompress(payload)
+            elif compression_id == COMPRESSIONS["zstd"]:
+                payload = zstandard.ZstdDecompressor().decompress(payload)
+            elif compression_id == COMPRESSIONS["lz4"]:
+                if lz4_frame is None:
+                    raise CacheCodecError("lz4 is not installed")
+                payload = lz4_frame.decompress(payload)
+            elif compression_id != COMPRESSIONS["none"]:
+                raise CacheCodecError(f"Unknown compression id: {compression_id}")
+
+            if serializer_id == SERIALIZERS["msgpack"]:
+                value = msgpack.unpackb(
+                    payload, raw=False, strict_map_key=False, ext_hook=_unpack_ext
+                )
+                return DecodedValue(value, len(payload), created_at)
+            if serializer_id == SERIALIZERS["json"]:
+                return DecodedValue(json.loads(payload), len(payload), created_at)
+            raise CacheCodecError(f"Unknown serializer id: {serializer_id}")
+        except CacheCodecError:
+            raise
+        except Exception as e:
+            raise CacheCodecError(f"Could not decode cached value: {e}") from e
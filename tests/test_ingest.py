@@ -0,0 +1,98 @@
+import struct
+
+import pytest
+import shapely
+from shapely.geometry import Point, Polygon
+
+from geodini import ingest
+from geodini.ingest import TEXT_OID, encode_copy_rows, encode_text_array, wkb_to_ewkb
+
+
+POLYGON = Polygon([(0, 0), (1, 0), (1, 1), (0, 0)])
+
+
+@pytest.mark.parametrize("geometry", [Point(1, 2), POLYGON])
+@pytest.mark.parametrize("byte_order", [0, 1])
+def test_wkb_to_ewkb(geometry, byte_order):
+    ewkb = wkb_to_ewkb(shapely.to_wkb(geometry, byte_order=byte_order))
+
+    expected = shapely.to_wkb(
+        shapely.set_srid(geometry, 4326), byte_order=byte_order, include_srid=True
+    )
+    assert ewkb == expected
+    assert shapely.get_srid(shapely.from_wkb(ewkb)) == 4326
+
+
+def test_wkb_to_ewkb_keeps_an_existing_srid():
+    ewkb = shapely.to_wkb(shapely.set_srid(Point(1, 2), 3857), include_srid=True)
+    assert wkb_to_ewkb(ewkb) == ewkb
+
+
+def test_encode_text_array():
+    assert encode_text_array([]) == struct.pack("!iii", 0, 0, TEXT_OID)
+    assert encode_text_array(["ab", "é"]) == (
+        struct.pack("!iiiii", 1, 0, TEXT_OID, 2, 1)
+        + struct.pack("!i", 2)
+        + b"ab"
+        + struct.pack("!i", 2)
+        + "é".encode()
+    )
+
+
+def test_encode_copy_rows():
+    rows = [("id1", None, b"\x01\x02", ["a"]), ("id2", "", None, [])]
+
+    encoded = encode_copy_rows(rows)
+
+    array = encode_text_array(["a"])
+    empty_array = encode_text_array([])
+    assert encoded == (
+        struct.pack("!h", 4)
+        + struct.pack("!i", 3)
+        + b"id1"
+        + struct.pack("!i", -1)
+        + struct.pack("!i", 2)
+        + b"\x01\x02"
+        + struct.pack("!i", len(array))
+        + array
+        + struct.pack("!h", 4)
+        + struct.pack("!i", 3)
+        + b"id2"
+        + struct.pack("!i", 0)
+        + struct.pack("!i", -1)
+        + struct.pack("!i", len(empty_array))
+        + empty_array
+    )
+
+
+def test_encode_copy_rows_without_rows():
+    assert encode_copy_rows([]) == b""
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(ingest, "OVERTURE_RELEASE", ingest.LEGACY_RELEASE)
+    return tmp_path
+
+
+def test_release_data_path(data_path):
+    expected = data_path / ingest.LEGACY_RELEASE / "divisions"
+    assert ingest.release_data_path("divisions") == str(expected)
+
+
+def test_release_data_path_uses_legacy_layout(data_path):
+    (data_path / "divisions").mkdir()
+    (data_path / "divisions" / "part-0.parquet").touch()
+    assert ingest.release_data_path("divisions") == str(data_path / "divisions")
+
+
+def test_release_data_path_ignores_legacy_layout_for_other_releases(
+    data_path, monkeypatch
+):
+    monkeypatch.setattr(ingest, "OVERTURE_RELEASE", "2025-06-25.0")
+    (data_path / "divisions").mkdir()
+    (data_path / "divisions" / "part-0.parquet").touch()
+    assert ingest.release_data_path("divisions") == str(
+        data_path / "2025-06-25.0" / "divisions"
+    )
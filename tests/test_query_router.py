@@ -0,0 +1,43 @@
+import pytest
+
+from geodini.agents.utils.query_router import classify_query
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "United States of America",
+        "Federated States of Micronesia",
+        "Near Islands",
+        "Outside Lands",
+        "100 Mile House",
+        "Between Two Rivers",
+        "Scottish Borders",
+    ],
+)
+def test_place_names_are_not_classified_complex(query):
+    assert classify_query(query) != "complex"
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "regions in India",
+        "all states of Brazil",
+        "counties near London",
+        "within 10 km of Paris",
+        "within 10 km of Scottish Borders",
+    ],
+)
+def test_complex_queries(query):
+    assert classify_query(query) == "complex"
+
+
+@pytest.mark.parametrize("query", ["Paris", "São Paulo", "Bengaluru, India"])
+def test_simple_queries(query):
+    assert classify_query(query) == "simple"
+
+
+@pytest.mark.parametrize("query", ["India and Sri Lanka", "Castile and León"])
+def test_conjunctions_are_left_to_the_router(query):
+    assert classify_query(query) is None
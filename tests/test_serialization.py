@@ -0,0 +1,96 @@
+import json
+import time
+
+import msgpack
+import pytest
+
+from geodini.serialization import (
+    COMPRESSIONS,
+    FORMAT_VERSION,
+    MAGIC,
+    SERIALIZERS,
+    CacheCodec,
+    CacheCodecError,
+    is_compressed,
+    lz4_frame,
+)
+
+
+POLYGON = {
+    "type": "Polygon",
+    "coordinates": [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 0.0]]],
+}
+
+
+def geojson_equal(a, b):
+    return json.loads(json.dumps(a)) == json.loads(json.dumps(b))
+
+
+@pytest.mark.parametrize("serializer", ["msgpack", "json"])
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd"])
+def test_round_trip(serializer, compression):
+    codec = CacheCodec(serializer, compression, min_compress_bytes=0)
+    value = [{"name": "Paris", "country": "FR", "geometry": POLYGON}] * 20
+    raw, _ = codec.encode(value, 1700000000.0)
+
+    decoded = codec.decode(raw)
+
+    assert raw.startswith(MAGIC) and raw[len(MAGIC)] == FORMAT_VERSION
+    assert is_compressed(raw) == (compression != "none")
+    assert geojson_equal(decoded.value, value)
+    assert decoded.created_at == 1700000000.0
+
+
+@pytest.mark.skipif(lz4_frame is None, reason="lz4 is not installed")
+def test_lz4_round_trip():
+    codec = CacheCodec("msgpack", "lz4", min_compress_bytes=0)
+    raw, _ = codec.encode({"geometry": POLYGON}, time.time())
+    assert geojson_equal(codec.decode(raw).value, {"geometry": POLYGON})
+
+
+def test_small_values_are_not_compressed():
+    codec = CacheCodec("msgpack", "zstd", min_compress_bytes=1024)
+    raw, _ = codec.encode({"name": "Paris"}, time.time())
+    assert not is_compressed(raw)
+
+
+def test_geojson_geometry_is_stored_as_wkb():
+    raw, _ = CacheCodec("msgpack", "none").encode({"geometry": POLYGON}, time.time())
+    packed = msgpack.unpackb(raw[len(MAGIC) + 3 + 8 :], raw=False)
+    assert isinstance(packed["geometry"], msgpack.ExtType)
+
+
+def test_unknown_geometry_type_stays_plain():
+    codec = CacheCodec("msgpack", "none")
+    value = {"geometry": {"type": "Bogus", "coordinates": [1, 2]}}
+    raw, _ = codec.encode(value, time.time())
+    assert codec.decode(raw).value == value
+
+
+def test_decode_version_1():
+    payload = msgpack.packb({"name": "Paris"}, use_bin_type=True)
+    raw = MAGIC + bytes([1, SERIALIZERS["msgpack"], COMPRESSIONS["none"]]) + payload
+
+    decoded = CacheCodec().decode(raw)
+
+    assert decoded.value == {"name": "Paris"}
+    assert decoded.created_at is None
+
+
+@pytest.mark.parametrize("raw", ['{"name": "Paris"}', b'{"name": "Paris"}'])
+def test_decode_legacy_json(raw):
+    decoded = CacheCodec().decode(raw)
+    assert decoded.value == {"name": "Paris"}
+    assert decoded.created_at is None
+
+
+def test_decode_unknown_version():
+    raw = MAGIC + bytes([99, SERIALIZERS["msgpack"], COMPRESSIONS["none"]])
+    with pytest.raises(CacheCodecError):
+        CacheCodec().decode(raw)
+
+
+@pytest.mark.parametrize("serializer", ["msgpack", "json"])
+def test_unencodable_value_raises_type_error(serializer):
+    with pytest.raises(TypeError):
+        CacheCodec(serializer, "none").encode({"value": object()}, time.time())